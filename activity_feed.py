@@ -0,0 +1,156 @@
+"""
+Live command activity, pushed to dashboards instead of polled.
+
+Whenever a command log is written (execute, scripts, scheduled runs) the
+writer calls publish_logs() after its commit, and every open feed of that
+user gets one ActivityEvent per log. Feeds are served over SSE and
+WebSocket by routers/activity.py.
+
+Each subscription buffers at most FEED_BUFFER_SIZE events. A consumer that
+falls that far behind is disconnected rather than having events dropped:
+it reconnects with the last id it saw and replay() fills the gap from
+command_logs (up to FEED_REPLAY_LIMIT rows; beyond that it is told to
+reload), so nothing is silently lost.
+
+The pub/sub is per process. With several workers a feed only sees live
+events from commands run by its own worker; the rest arrive on the next
+reconnect's replay.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from fast_json import schema_columns
+from metrics import ACTIVITY_FEED_DISCONNECTS, Gauge
+from models import CommandLog
+from schemas import ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+
+class FeedClosed(Exception):
+    """The subscription was ended by the feed (slow consumer, shutdown)"""
+
+
+class Subscription:
+    def __init__(self, user_id: int, limit: int):
+        self.user_id = user_id
+        self.closed_reason: Optional[str] = None
+        self._events: Deque[Dict] = deque()
+        self._limit = limit
+        self._ready = asyncio.Event()
+
+    def push(self, event: Dict) -> bool:
+        """Buffer event; False when the buffer is full"""
+        if len(self._events) >= self._limit:
+            return False
+        self._events.append(event)
+        self._ready.set()
+        return True
+
+    def close(self, reason: str) -> None:
+        self.closed_reason = reason
+        self._ready.set()
+
+    async def next(self, timeout: float) -> Optional[Dict]:
+        """The next event, or None if none arrived within timeout. Raises FeedClosed once closed."""
+        if not self._events and self.closed_reason is None:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.closed_reason is not None:
+            raise FeedClosed(self.closed_reason)
+        return self._events.popleft()
+
+
+class ActivityFeed:
+    """Per-user fan-out of command log events. Subscribe and consume on the event loop; publish from anywhere."""
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+    def count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def subscribe(self, user_id: int) -> Optional[Subscription]:
+        """A new subscription, or None when the user already has FEED_MAX_SUBSCRIBERS_PER_USER"""
+        subscriptions = self._subscriptions.setdefault(user_id, set())
+        if len(subscriptions) >= settings.FEED_MAX_SUBSCRIBERS_PER_USER:
+            return None
+        subscription = Subscription(user_id, settings.FEED_BUFFER_SIZE)
+        subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def close_all(self, reason: str) -> None:
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                self._drop(subscription, reason)
+
+    def _drop(self, subscription: Subscription, reason: str) -> None:
+        self.unsubscribe(subscription)
+        subscription.close(reason)
+        ACTIVITY_FEED_DISCONNECTS.inc(reason)
+
+    def _deliver(self, user_id: int, events: List[Dict]) -> None:
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            for event in events:
+                if not subscription.push(event):
+                    logger.info(f"Disconnecting slow activity feed subscriber of user {user_id}")
+                    self._drop(subscription, "slow_consumer")
+                    break
+
+    def publish(self, user_id: int, events: List[Dict]) -> None:
+        if not events or user_id not in self._subscriptions or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(user_id, events)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, user_id, events)
+
+    def publish_logs(self, db: Session, user_id: int, log_ids: List[int]) -> None:
+        """Publish committed command logs; a no-op (no query) when the user has no open feed"""
+        if not log_ids or user_id not in self._subscriptions:
+            return
+        rows = db.query(*schema_columns(CommandLog, ActivityEvent)).filter(
+            CommandLog.id.in_(log_ids)
+        ).order_by(CommandLog.id).all()
+        self.publish(user_id, [row._asdict() for row in rows])
+
+
+def replay(db: Session, user_id: int, after_id: int) -> Tuple[List[Dict], bool]:
+    """
+    The user's events after after_id, oldest first, and whether older ones
+    were left out because there were more than FEED_REPLAY_LIMIT.
+    """
+    rows = db.query(*schema_columns(CommandLog, ActivityEvent)).filter(
+        CommandLog.user_id == user_id,
+        CommandLog.id > after_id
+    ).order_by(CommandLog.id.desc()).limit(settings.FEED_REPLAY_LIMIT + 1).all()
+    truncated = len(rows) > settings.FEED_REPLAY_LIMIT
+    return [row._asdict() for row in reversed(rows[:settings.FEED_REPLAY_LIMIT])], truncated
+
+
+activity_feed = ActivityFeed()
+
+Gauge("activity_feed_subscribers", "Open live activity feeds", callback=lambda: [((), activity_feed.count())])
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
+from anyio import to_thread
+from fastapi import HTTPException, status
+
+from config import settings
+from metrics import Gauge, ADMISSION_WAIT, ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+
+@dataclass(eq=False)
+class Ticket:
+    user_id: int
+    host: str
+    lane: str
+    future: Optional[asyncio.Future] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class AdmissionController:
+    """
+    Concurrency limits for SSH work: per target host, per user and global.
+
+    Requests over a limit wait in a queue per lane. Within a lane users are
+    served round-robin, so one user with hundreds of queued commands doesn't
+    delay another user's single command; across lanes interactive requests
+    win ADMISSION_INTERACTIVE_WEIGHT grants for every batch one while both
+    are waiting. Queue waits are bounded: a full per-user queue is a 429, a
+    full global queue or a wait past ADMISSION_QUEUE_TIMEOUT is a 503.
+
+    Limits are per process. All methods must be called on the event loop.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._per_host: Dict[str, int] = {}
+        self._per_user: Dict[int, int] = {}
+        # lane -> user_id -> waiting tickets; dict order is the round-robin ring
+        self._queues: Dict[str, "OrderedDict[int, Deque[Ticket]]"] = {lane: OrderedDict() for lane in LANES}
+        self._queued = 0
+        self._interactive_streak = 0
+
+    def queue_depth(self, lane: str) -> int:
+        return sum(len(queue) for queue in self._queues[lane].values())
+
+    def _user_queued(self, user_id: int) -> int:
+        return sum(len(self._queues[lane].get(user_id, ())) for lane in LANES)
+
+    def _can_run(self, ticket: Ticket) -> bool:
+        return (
+            self.in_flight < settings.ADMISSION_MAX_GLOBAL
+            and self._per_host.get(ticket.host, 0) < settings.ADMISSION_MAX_PER_HOST
+            and self._per_user.get(ticket.user_id, 0) < settings.ADMISSION_MAX_PER_USER
+        )
+
+    def _grant(self, ticket: Ticket) -> None:
+        self.in_flight += 1
+        self._per_host[ticket.host] = self._per_host.get(ticket.host, 0) + 1
+        self._per_user[ticket.user_id] = self._per_user.get(ticket.user_id, 0) + 1
+
+    def release(self, ticket: Ticket) -> None:
+        self.in_flight -= 1
+        for counts, key in ((self._per_host, ticket.host), (self._per_user, ticket.user_id)):
+            counts[key] -= 1
+            if not counts[key]:
+                del counts[key]
+        self._dispatch()
+
+    def _lane_order(self):
+        if self._interactive_streak >= settings.ADMISSION_INTERACTIVE_WEIGHT and self._queues[BATCH]:
+            return (BATCH, INTERACTIVE)
+        return LANES
+
+    def _next_waiter(self) -> Optional[Ticket]:
+        for lane in self._lane_order():
+            ring = self._queues[lane]
+            for user_id in list(ring):
+                queue = ring[user_id]
+                ticket = next((t for t in queue if self._can_run(t)), None)
+                if ticket is None:
+                    continue
+                queue.remove(ticket)
+                if queue:
+                    ring.move_to_end(user_id)
+                else:
+                    del ring[user_id]
+                self._queued -= 1
+                self._interactive_streak = self._interactive_streak + 1 if lane == INTERACTIVE else 0
+                return ticket
+        return None
+
+    def _dispatch(self) -> None:
+        while self.in_flight < settings.ADMISSION_MAX_GLOBAL:
+            ticket = self._next_waiter()
+            if ticket is None:
+                return
+            self._grant(ticket)
+            ticket.future.set_result(None)
+
+    def _dequeue(self, ticket: Ticket) -> None:
+        queue = self._queues[ticket.lane].get(ticket.user_id)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            self._queued -= 1
+            if not queue:
+                del self._queues[ticket.lane][ticket.user_id]
+
+    def _reject(self, lane: str, reason: str, status_code: int, detail: str) -> HTTPException:
+        ADMISSION_REJECTED.inc(lane, reason)
+        logger.warning(f"Admission rejected ({lane}, {reason}): {detail}")
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(int(settings.ADMISSION_QUEUE_TIMEOUT // 2), 1))}
+        )
+
+    async def acquire(self, user_id: int, host: str, lane: str = INTERACTIVE) -> Ticket:
+        if lane not in LANES:
+            raise ValueError(f"Unknown admission lane: {lane}")
+        ticket = Ticket(user_id=user_id, host=host, lane=lane)
+
+        # Fast path only when nobody is waiting, so new arrivals can't jump the queue
+        if not self._queued and self._can_run(ticket):
+            self._grant(ticket)
+            ADMISSION_WAIT.observe(0.0, lane)
+            return ticket
+
+        if self._user_queued(user_id) >= settings.ADMISSION_MAX_QUEUED_PER_USER:
+            raise self._reject(lane, "user_queue_full", status.HTTP_429_TOO_MANY_REQUESTS,
+                               "Too many queued commands for this user; retry later")
+        if self._queued >= settings.ADMISSION_MAX_QUEUED:
+            raise self._reject(lane, "queue_full", status.HTTP_503_SERVICE_UNAVAILABLE,
+                               "Execution queue is full; retry later")
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queues[lane].setdefault(user_id, deque()).append(ticket)
+        self._queued += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(ticket.future, timeout=settings.ADMISSION_QUEUE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._dequeue(ticket)
+            # Granted in the same loop iteration the wait ended: hand the slot back
+            if ticket.future.done() and not ticket.future.cancelled():
+                self.release(ticket)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(lane, "timeout", status.HTTP_503_SERVICE_UNAVAILABLE,
+                               "Timed out waiting for an execution slot; retry later")
+        ADMISSION_WAIT.observe(time.monotonic() - ticket.enqueued_at, lane)
+        return ticket
+
+    def size_threadpool(self) -> None:
+        """
+        Give anyio's threadpool a thread per global slot plus
+        THREADPOOL_EXTRA_THREADS for everything else run there (database
+        queries, bcrypt, compression). With fewer threads than slots, admitted
+        work would wait for a thread in anyio's own unfair, unbounded queue.
+        """
+        limiter = to_thread.current_default_thread_limiter()
+        limiter.total_tokens = max(limiter.total_tokens, settings.ADMISSION_MAX_GLOBAL + settings.THREADPOOL_EXTRA_THREADS)
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, host: str, lane: str = INTERACTIVE):
+        ticket = await self.acquire(user_id, host, lane)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+
+def host_key(server) -> str:
+    return f"{server.host}:{server.port}"
+
+
+admission = AdmissionController()
+
+Gauge(
+    "admission_queue_depth", "Requests waiting for an SSH execution slot by lane", ("lane",),
+    callback=lambda: [((lane,), admission.queue_depth(lane)) for lane in LANES]
+)
+Gauge(
+    "admission_in_flight", "SSH executions currently admitted",
+    callback=lambda: [((), admission.in_flight)]
+)
@@ -0,0 +1,246 @@
+"""
+Per-server execution rollups.
+
+record_execution() runs next to every db.add(CommandLog(...)) for an
+executed command, in the same transaction, and bumps that server's
+counters for the current hour: totals in command_rollups, exit statuses and
+a fixed duration histogram in command_rollup_counts. Each bump is a single
+INSERT ... ON CONFLICT DO UPDATE, so concurrent writers never lose counts
+and the analytics endpoint only ever sums a few rows per server and hour,
+however large command_logs grows. Percentiles are estimated from the
+histogram.
+
+Interactive shell transcripts aren't commands and aren't recorded.
+"""
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import CommandLog, CommandRollup, CommandRollupCount, Server
+
+# Upper bounds of the duration histogram; slower runs land in the last bucket
+DURATION_BUCKETS_MS = (
+    10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000, 600000
+)
+# Stored exit status for runs that never got one (connection/auth errors, blocked commands)
+NO_EXIT_STATUS = -1
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def naive_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def bucket_start(moment: datetime, size: str = "hour") -> datetime:
+    """Start of moment's hour (or day) as naive UTC, the way rollups are keyed"""
+    moment = naive_utc(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if size == "day" else moment
+
+
+def duration_bucket(duration_ms: float) -> int:
+    index = bisect_left(DURATION_BUCKETS_MS, duration_ms)
+    return DURATION_BUCKETS_MS[min(index, len(DURATION_BUCKETS_MS) - 1)]
+
+
+def histogram_percentile(histogram: Dict[int, int], percent: float) -> Optional[float]:
+    """Estimate a percentile from duration bucket counts, interpolating inside the bucket it falls in"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = total * percent / 100
+    seen, lower = 0, 0
+    for bound in DURATION_BUCKETS_MS:
+        count = histogram.get(bound, 0)
+        if count and seen + count >= rank:
+            return lower + (bound - lower) * (rank - seen) / count
+        seen, lower = seen + count, bound
+    return float(DURATION_BUCKETS_MS[-1])
+
+
+def _upsert(
+    db: Session,
+    model,
+    conflict: Sequence[str],
+    row: Dict,
+    increments: Sequence[str],
+    maxima: Sequence[str] = ()
+) -> None:
+    """Insert row, or add its increments columns to (and keep the larger maxima of) the existing one"""
+    table = model.__table__
+    dialect_insert = _UPSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(table).values(**row)
+        new = statement.excluded
+        updates = {name: table.c[name] + new[name] for name in increments}
+        updates.update({name: case((new[name] > table.c[name], new[name]), else_=table.c[name]) for name in maxima})
+        db.execute(statement.on_conflict_do_update(index_elements=list(conflict), set_=updates))
+        return
+    # No native upsert: update, then insert if the row didn't exist yet
+    updates = {name: table.c[name] + row[name] for name in increments}
+    updates.update({name: case((table.c[name] < row[name], row[name]), else_=table.c[name]) for name in maxima})
+    result = db.execute(update(table).where(*[table.c[name] == row[name] for name in conflict]).values(updates))
+    if not result.rowcount:
+        db.execute(insert(table).values(**row))
+
+
+def record_execution(db: Session, log: CommandLog) -> None:
+    """
+    Count log in its server's rollup for the current hour. Call before the
+    commit that writes log; its duration_ms feeds the duration stats.
+    """
+    key = {"user_id": log.user_id, "server_id": log.server_id, "bucket_start": bucket_start(datetime.utcnow())}
+    duration_ms = log.duration_ms
+    timed = duration_ms is not None and not log.cached
+    _upsert(
+        db, CommandRollup, ("server_id", "bucket_start"),
+        {
+            **key,
+            "executions": 1,
+            "failures": int(log.exit_status != 0),
+            "cached": int(bool(log.cached)),
+            "timed": int(timed),
+            "duration_total_ms": duration_ms if timed else 0.0,
+            "duration_max_ms": duration_ms if timed else 0.0,
+        },
+        increments=("executions", "failures", "cached", "timed", "duration_total_ms"),
+        maxima=("duration_max_ms",)
+    )
+    # Same order in every transaction, so concurrent writers can't deadlock on these rows
+    counts = [("duration_ms", duration_bucket(duration_ms))] if timed else []
+    counts.append(("exit_status", NO_EXIT_STATUS if log.exit_status is None else log.exit_status))
+    for dimension, value in counts:
+        _upsert(
+            db, CommandRollupCount, ("server_id", "bucket_start", "dimension", "value"),
+            {**key, "dimension": dimension, "value": value, "count": 1},
+            increments=("count",)
+        )
+
+
+class _Stats:
+    def __init__(self):
+        self.executions = self.failures = self.cached = self.timed = 0
+        self.duration_total_ms = 0.0
+        self.duration_max_ms = 0.0
+        self.exit_statuses: Dict[int, int] = {}
+        self.durations: Dict[int, int] = {}
+
+    def add_totals(self, executions, failures, cached, timed, duration_total_ms, duration_max_ms) -> None:
+        self.executions += executions
+        self.failures += failures
+        self.cached += cached
+        self.timed += timed
+        self.duration_total_ms += duration_total_ms
+        self.duration_max_ms = max(self.duration_max_ms, duration_max_ms)
+
+    def add_count(self, dimension: str, value: int, count: int) -> None:
+        counts = self.exit_statuses if dimension == "exit_status" else self.durations
+        counts[value] = counts.get(value, 0) + count
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failures / self.executions if self.executions else 0.0
+
+    def percentile(self, percent: float) -> Optional[float]:
+        estimate = histogram_percentile(self.durations, percent)
+        return None if estimate is None else round(min(estimate, self.duration_max_ms), 3)
+
+    def as_dict(self) -> Dict:
+        return {
+            "executions": self.executions,
+            "failures": self.failures,
+            "failure_rate": round(self.failure_rate, 4),
+            "cached": self.cached,
+            "exit_statuses": [
+                {"exit_status": None if value == NO_EXIT_STATUS else value, "count": count}
+                for value, count in sorted(self.exit_statuses.items(), key=lambda item: -item[1])
+            ],
+            "duration": {
+                "count": self.timed,
+                "mean_ms": round(self.duration_total_ms / self.timed, 3) if self.timed else None,
+                "p50_ms": self.percentile(50),
+                "p90_ms": self.percentile(90),
+                "p99_ms": self.percentile(99),
+                "max_ms": round(self.duration_max_ms, 3) if self.timed else None,
+            },
+        }
+
+
+def server_analytics(
+    db: Session,
+    user_id: int,
+    since: datetime,
+    until: datetime,
+    server_id: Optional[int] = None,
+    bucket: Optional[str] = None
+) -> List[Dict]:
+    """
+    A user's per-server stats over the hours overlapping [since, until),
+    highest failure rate first. With bucket ("hour" or "day")
+    each server also gets its stats per time bucket, oldest first.
+    """
+    since, until = bucket_start(since), naive_utc(until)
+
+    def grouped(model, *columns):
+        keys = [model.server_id, model.bucket_start] if bucket else [model.server_id]
+        query = db.query(*keys, *columns).filter(
+            model.user_id == user_id,
+            model.bucket_start >= since,
+            model.bucket_start < until
+        )
+        if server_id is not None:
+            query = query.filter(model.server_id == server_id)
+        return query, keys
+
+    def stats_for(row) -> List[_Stats]:
+        """The server total, and with bucket the row's time bucket, that a result row adds to"""
+        targets = [totals.setdefault(row.server_id, _Stats())]
+        if bucket:
+            server_buckets = buckets.setdefault(row.server_id, {})
+            targets.append(server_buckets.setdefault(bucket_start(row.bucket_start, bucket), _Stats()))
+        return targets
+
+    totals: Dict[int, _Stats] = {}
+    buckets: Dict[int, Dict[datetime, _Stats]] = {}
+    sums, keys = grouped(
+        CommandRollup,
+        func.sum(CommandRollup.executions).label("executions"),
+        func.sum(CommandRollup.failures).label("failures"),
+        func.sum(CommandRollup.cached).label("cached"),
+        func.sum(CommandRollup.timed).label("timed"),
+        func.sum(CommandRollup.duration_total_ms).label("duration_total_ms"),
+        func.max(CommandRollup.duration_max_ms).label("duration_max_ms")
+    )
+    for row in sums.group_by(*keys):
+        for target in stats_for(row):
+            target.add_totals(
+                row.executions, row.failures, row.cached, row.timed, row.duration_total_ms, row.duration_max_ms
+            )
+    counts, keys = grouped(
+        CommandRollupCount,
+        CommandRollupCount.dimension,
+        CommandRollupCount.value,
+        func.sum(CommandRollupCount.count).label("count")
+    )
+    for row in counts.group_by(*keys, CommandRollupCount.dimension, CommandRollupCount.value):
+        for target in stats_for(row):
+            target.add_count(row.dimension, row.value, row.count)
+
+    names = dict(db.query(Server.id, Server.name).filter(Server.id.in_(totals))) if totals else {}
+    results = []
+    for stats_server_id, server_stats in totals.items():
+        result = {"server_id": stats_server_id, "server_name": names.get(stats_server_id), **server_stats.as_dict()}
+        if bucket:
+            result["buckets"] = [
+                {"bucket_start": start, **bucket_stats.as_dict()}
+                for start, bucket_stats in sorted(buckets[stats_server_id].items())
+            ]
+        results.append(result)
+    results.sort(key=lambda result: (-result["failure_rate"], -result["executions"]))
+    return results
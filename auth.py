@@ -1,13 +1,17 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
+from jose.exceptions import JWTError
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, SessionLocal
 from models import User
 from config import settings
+from bootstrap import lazy_import
+
+# jose.jwt pulls in the cryptography backend; defer it to the first token operation
+jwt = lazy_import("jose.jwt")
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
@@ -47,7 +51,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def get_user_from_token(token: str, db: Session) -> User:
+    """Resolve a bearer token to an active user; also used where the OAuth2 header dependency can't be (WebSockets)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -68,3 +73,28 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
+
+def authenticate_token(token: Optional[str]) -> Optional[User]:
+    """The token's user, or None; opens its own session (blocking, for WebSockets and streams)"""
+    if not token:
+        return None
+    db = SessionLocal()
+    try:
+        return get_user_from_token(token, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    return get_user_from_token(token, db)
+
+
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.username not in settings.admin_usernames_list:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
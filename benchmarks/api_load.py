@@ -0,0 +1,235 @@
+"""
+End-to-end load benchmark for the hot API paths.
+
+Starts the app under uvicorn against a throwaway SQLite database, an
+in-process SSH server and a local SMTP sink, then drives login, server
+listing, command execution and log listing at a fixed concurrency.
+
+    python -m benchmarks.api_load --concurrency 8 --requests 200 --output bench.json
+    python -m benchmarks.api_load --baseline bench.json --max-regression 0.2
+
+Results are printed as JSON. With --baseline the run fails (exit code 1)
+when any scenario's p95 latency regresses by more than --max-regression.
+"""
+import argparse
+import http.client
+import importlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+SCENARIOS = ("login", "servers", "execute", "logs")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class ApiClient:
+    """Keep-alive HTTP client, one per worker thread"""
+
+    def __init__(self, port: int, token: Optional[str] = None):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        self.token = token
+
+    def request(self, method: str, path: str, body=None, form: bool = False) -> http.client.HTTPResponse:
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = None
+        if body is not None:
+            if form:
+                payload = urllib.parse.urlencode(body)
+                headers["Content-Type"] = "application/x-www-form-urlencoded"
+            else:
+                payload = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+        self.conn.request(method, path, body=payload, headers=headers)
+        response = self.conn.getresponse()
+        response.data = response.read()
+        return response
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def start_stack(workdir: str):
+    """Start SSH and SMTP stand-ins, point the settings at them and serve the app. Returns (server, port, stubs)."""
+    from benchmarks.stubs import SMTPSink, StubSSHServer
+
+    ssh_stub = StubSSHServer().start()
+    smtp_sink = SMTPSink().start()
+
+    # Settings are read at import time, so the environment must be in place first
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "DEBUG": "false",
+        "SENDGRID_API_KEY": "",
+        "EMAIL_HOST": smtp_sink.host,
+        "EMAIL_PORT": str(smtp_sink.port),
+        "EMAIL_USE_TLS": "false",
+        "EMAIL_HOST_USER": "bench",
+        "EMAIL_HOST_PASSWORD": "bench",
+    })
+
+    import uvicorn
+    app_module = importlib.import_module("main")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = uvicorn.Config(app_module.app, host="127.0.0.1", port=0, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, port, {"ssh": ssh_stub, "smtp": smtp_sink}
+
+
+def seed(port: int, ssh_stub) -> Dict[str, object]:
+    client = ApiClient(port)
+    credentials = {"username": "bench", "password": "bench-password"}
+    client.request("POST", "/api/auth/register", {**credentials, "email": "bench@example.com"})
+    token = json.loads(client.request("POST", "/api/auth/login", credentials, form=True).data)["access_token"]
+    client.token = token
+    server = json.loads(client.request("POST", "/api/servers", {
+        "name": "bench-stub",
+        "host": ssh_stub.host,
+        "port": ssh_stub.port,
+        "username": ssh_stub.username,
+        "password": ssh_stub.password,
+    }).data)
+    # Give the logs endpoint something to page through
+    for i in range(20):
+        client.request("POST", "/api/commands/execute", {"server_id": server["id"], "command": f"echo seed {i}"})
+    client.close()
+    return {"token": token, "server_id": server["id"], "credentials": credentials}
+
+
+def scenario_call(name: str, context: Dict[str, object]) -> Callable[[ApiClient], int]:
+    if name == "login":
+        return lambda client: client.request("POST", "/api/auth/login", context["credentials"], form=True).status
+    if name == "servers":
+        return lambda client: client.request("GET", "/api/servers").status
+    if name == "execute":
+        body = {"server_id": context["server_id"], "command": "uptime"}
+        return lambda client: client.request("POST", "/api/commands/execute", body).status
+    if name == "logs":
+        return lambda client: client.request("GET", "/api/commands/logs?limit=100").status
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def run_scenario(port: int, name: str, context: Dict[str, object], concurrency: int, requests: int) -> dict:
+    call = scenario_call(name, context)
+    per_worker = max(requests // concurrency, 1)
+    token = None if name == "login" else context["token"]
+
+    def worker() -> Dict[str, list]:
+        client = ApiClient(port, token)
+        latencies, errors = [], 0
+        try:
+            for _ in range(per_worker):
+                start = time.perf_counter()
+                try:
+                    status = call(client)
+                except Exception:
+                    status = 0
+                    client.close()
+                    client = ApiClient(port, token)
+                latencies.append(time.perf_counter() - start)
+                if status >= 400 or status == 0:
+                    errors += 1
+        finally:
+            client.close()
+        return {"latencies": latencies, "errors": errors}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: worker(), range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(lat for result in results for lat in result["latencies"])
+    return {
+        "requests": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base["latency_ms"]["p95"]:
+            continue
+        ratio = result["latency_ms"]["p95"] / base["latency_ms"]["p95"] - 1
+        if ratio > max_regression:
+            regressions.append(
+                f"{name}: p95 {result['latency_ms']['p95']}ms vs baseline {base['latency_ms']['p95']}ms (+{ratio:.0%})"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ssh-manager-bench-") as workdir:
+        server, port, stubs = start_stack(workdir)
+        try:
+            context = seed(port, stubs["ssh"])
+            report = {
+                "config": {"concurrency": args.concurrency, "requests": args.requests},
+                "results": {},
+            }
+            for name in args.scenarios.split(","):
+                report["results"][name] = run_scenario(port, name.strip(), context, args.concurrency, args.requests)
+            report["emails_delivered"] = stubs["smtp"].messages
+        finally:
+            server.should_exit = True
+            stubs["ssh"].close()
+            stubs["smtp"].close()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
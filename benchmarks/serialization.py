@@ -0,0 +1,153 @@
+"""
+List-response serialization benchmark: ORM + response_model + json versus
+column tuples + orjson.
+
+Seeds a throwaway SQLite database with command logs (and servers), then
+builds the /api/commands/logs and /api/servers response bodies both ways:
+
+    legacy  query full ORM objects, validate them through the response
+            schema and encode with the standard json module (what FastAPI
+            does for a response_model)
+    fast    query the schema's columns as tuples and dump with orjson
+            (fast_json.rows_response, what the endpoints do now)
+
+    python -m benchmarks.serialization --rows 100 --output-size 16384 --iterations 50
+
+Reports (as JSON) per endpoint and path: latency percentiles per response,
+body size, and whether both paths produced the same JSON.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+from benchmarks.api_load import percentile
+
+
+def seed(database, models, rows: int, output_size: int) -> int:
+    import output_blobs
+    db = database.SessionLocal()
+    try:
+        user = models.User(username="serial-bench", email="serial-bench@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        servers = [
+            models.Server(user_id=user.id, name=f"host-{index:03d}", host=f"10.0.{index // 250}.{index % 250}",
+                          port=22, username="deploy", password="secret", description="benchmark host")
+            for index in range(rows)
+        ]
+        db.add_all(servers)
+        db.flush()
+        line = "x" * 79 + "\n"
+        output = (line * (output_size // len(line) + 1))[:output_size]
+        db.add_all([
+            models.CommandLog(user_id=user.id, server_id=servers[index % len(servers)].id,
+                              command=f"journalctl -n {index}", exit_status=0,
+                              **output_blobs.store(db, output, None))
+            for index in range(rows)
+        ])
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def measure(build: Callable[[], bytes], iterations: int) -> dict:
+    build()  # warm up caches and the connection pool
+    timings: List[float] = []
+    body = b""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        body = build()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "body_bytes": len(body),
+        "_body": body,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100, help="rows per response (the log page size)")
+    parser.add_argument("--output-size", type=int, default=16384, help="bytes of output per command log")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="serialization-") as workdir:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+        logging.getLogger().setLevel(logging.CRITICAL)
+        database = importlib.import_module("database")
+        models = importlib.import_module("models")
+        schemas = importlib.import_module("schemas")
+        from fastapi.responses import JSONResponse
+        from pydantic import TypeAdapter
+        from fast_json import rows_response, schema_columns
+
+        database.init_db()
+        user_id = seed(database, models, args.rows, args.output_size)
+
+        def legacy(model, schema, order_by):
+            adapter = TypeAdapter(List[schema])
+
+            def build() -> bytes:
+                db = database.SessionLocal()
+                try:
+                    rows = db.query(model).filter(model.user_id == user_id).order_by(order_by).limit(args.rows).all()
+                    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+                    return JSONResponse(content).body
+                finally:
+                    db.close()
+            return build
+
+        def fast(model, schema, order_by):
+            def build() -> bytes:
+                db = database.SessionLocal()
+                try:
+                    rows = db.query(*schema_columns(model, schema)).filter(
+                        model.user_id == user_id
+                    ).order_by(order_by).limit(args.rows).all()
+                    return rows_response(rows).body
+                finally:
+                    db.close()
+            return build
+
+        endpoints = {
+            "/api/commands/logs": (models.CommandLog, schemas.CommandLogResponse, models.CommandLog.id.desc()),
+            "/api/servers": (models.Server, schemas.ServerResponse, models.Server.id),
+        }
+        results = []
+        for path, spec in endpoints.items():
+            before = measure(legacy(*spec), args.iterations)
+            after = measure(fast(*spec), args.iterations)
+            same = json.loads(before.pop("_body")) == json.loads(after.pop("_body"))
+            results.append({
+                "endpoint": path,
+                "legacy": before,
+                "fast": after,
+                "speedup_p50": round(before["p50_ms"] / after["p50_ms"], 2) if after["p50_ms"] else None,
+                "identical_json": same,
+            })
+        database.engine.dispose()
+
+    report = {"rows": args.rows, "output_size": args.output_size, "iterations": args.iterations, "results": results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
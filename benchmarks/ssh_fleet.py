@@ -0,0 +1,300 @@
+"""
+SSH fleet simulator for scale-testing SSHService.
+
+Spins up N lightweight SSH servers on localhost (one shared acceptor thread),
+each with configurable handshake delay, command runtime, output size, auth
+failure rate and dropped connections, registers them as Server rows and runs
+one command on every host at a given concurrency.
+
+    python -m benchmarks.ssh_fleet --hosts 200 --concurrency 50 --handshake-delay 0.05 \\
+        --command-runtime 0.2 --output-size 65536 --auth-failure-rate 0.02 --drop-rate 0.01
+
+With --bastion every host is registered behind one stub jump host and reached
+over direct-tcpip channels on a single shared bastion connection.
+
+Reports (as JSON) the connect-storm wall time, latency percentiles, outcomes
+by error, and traced Python memory per in-flight command.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import paramiko
+
+from benchmarks.api_load import percentile
+from benchmarks.stubs import StubSSHServer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HostBehavior:
+    handshake_delay: float = 0.0
+    command_runtime: float = 0.0
+    output_size: int = 64
+    auth_failure_rate: float = 0.0
+    drop_rate: float = 0.0
+    # "connect": close the socket before the SSH banner; "exec": kill the transport mid-command
+    drop_stage: str = "connect"
+
+
+class SimulatedHost(StubSSHServer):
+    def __init__(self, behavior: HostBehavior, rng: random.Random, **kwargs):
+        super().__init__(handler=self._handle_command, **kwargs)
+        self.behavior = behavior
+        self.rng = rng
+        self.connections = 0
+
+    def check_password(self, username: str, password: str) -> bool:
+        if self.rng.random() < self.behavior.auth_failure_rate:
+            return False
+        return super().check_password(username, password)
+
+    def serve(self, client: socket.socket) -> None:
+        self.connections += 1
+        if self.behavior.drop_stage == "connect" and self.rng.random() < self.behavior.drop_rate:
+            client.close()
+            return
+        if self.behavior.handshake_delay:
+            time.sleep(self.behavior.handshake_delay)
+        super().serve(client)
+
+    def run_exec(self, channel: paramiko.Channel, command: str) -> None:
+        if self.behavior.drop_stage == "exec" and self.rng.random() < self.behavior.drop_rate:
+            time.sleep(self.behavior.command_runtime / 2)
+            channel.get_transport().close()
+            return
+        super().run_exec(channel, command)
+
+    def _handle_command(self, command: str):
+        if self.behavior.command_runtime:
+            time.sleep(self.behavior.command_runtime)
+        line = b"x" * 79 + b"\n"
+        output = (line * (self.behavior.output_size // len(line) + 1))[:self.behavior.output_size]
+        return output, b"", 0
+
+
+class SimulatedFleet:
+    """N simulated hosts served by one selector-based acceptor thread"""
+
+    def __init__(self, size: int, behavior: HostBehavior, seed: int = 0):
+        rng = random.Random(seed)
+        self.hosts = [SimulatedHost(behavior, random.Random(rng.random())) for _ in range(size)]
+        self._selector = selectors.DefaultSelector()
+        for host in self.hosts:
+            host.listener.setblocking(False)
+            self._selector.register(host.listener, selectors.EVENT_READ, host)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._accept_loop, name="fleet-acceptor", daemon=True)
+
+    def start(self) -> "SimulatedFleet":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._closed.set()
+        self._thread.join(timeout=2)
+        for host in self.hosts:
+            host.close()
+        self._selector.close()
+
+    def _accept_loop(self) -> None:
+        while not self._closed.is_set():
+            for key, _ in self._selector.select(timeout=0.2):
+                host = key.data
+                try:
+                    client, _ = host.listener.accept()
+                except (BlockingIOError, OSError):
+                    continue
+                client.setblocking(True)
+                threading.Thread(target=host.serve, args=(client,), daemon=True).start()
+
+
+def register_servers(
+    db,
+    user_id: int,
+    fleet: SimulatedFleet,
+    bastion: Optional[StubSSHServer] = None
+) -> List[int]:
+    """Create a Server row for every simulated host (behind bastion, if given) and return their ids"""
+    from models import Server
+
+    jump_host_id = None
+    if bastion is not None:
+        jump_host = Server(
+            user_id=user_id,
+            name="sim-bastion",
+            host=bastion.host,
+            port=bastion.port,
+            username=bastion.username,
+            password=bastion.password,
+            description="SSH fleet simulator jump host"
+        )
+        db.add(jump_host)
+        db.flush()
+        jump_host_id = jump_host.id
+
+    servers = [
+        Server(
+            user_id=user_id,
+            name=f"sim-{index:04d}",
+            host=host.host,
+            port=host.port,
+            username=host.username,
+            password=host.password,
+            description="SSH fleet simulator",
+            jump_host_id=jump_host_id
+        )
+        for index, host in enumerate(fleet.hosts)
+    ]
+    db.add_all(servers)
+    db.commit()
+    return [server.id for server in servers]
+
+
+def run_fleet(fleet: SimulatedFleet, concurrency: int, command: str, bastion: Optional[StubSSHServer] = None) -> dict:
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    database = importlib.import_module("database")
+    models = importlib.import_module("models")
+    from ssh_service import ConnectionProfile, JumpHost, SSHService
+
+    database.init_db()
+    db = database.SessionLocal()
+    try:
+        user = models.User(username="fleet-sim", email="fleet-sim@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        server_ids = register_servers(db, user.id, fleet, bastion)
+        servers = db.query(models.Server).filter(models.Server.id.in_(server_ids)).all()
+        # Profiles without server_id, so host keys aren't written back mid-run
+        targets = [
+            (s.host, s.port, s.username, s.password,
+             ConnectionProfile(jump=JumpHost.from_server(s.jump_host)) if s.jump_host else None)
+            for s in servers
+        ]
+    finally:
+        db.close()
+
+    in_flight = 0
+    peak_in_flight = 0
+    lock = threading.Lock()
+
+    def run_one(target):
+        nonlocal in_flight, peak_in_flight
+        host, port, username, password, profile = target
+        with lock:
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+        start = time.perf_counter()
+        try:
+            success, output, error, _ = SSHService.execute_command(
+                host=host, port=port, username=username, command=command, password=password, profile=profile
+            )
+        finally:
+            with lock:
+                in_flight -= 1
+        outcome = "ok" if success else (error or "unknown").split(":")[0]
+        return time.perf_counter() - start, outcome, len(output or "")
+
+    tracemalloc.start()
+    baseline_memory, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run_one, targets))
+    wall = time.perf_counter() - started
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if bastion is not None:
+        from ssh_service import bastion_pool
+        bastion_pool.close_all()
+
+    latencies = sorted(result[0] for result in results)
+    outcomes: Dict[str, int] = {}
+    for _, outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    report = {
+        "hosts": len(targets),
+        "wall_time_s": round(wall, 3),
+        "throughput_cmds_per_s": round(len(results) / wall, 1) if wall else 0.0,
+        "outcomes": outcomes,
+        "bytes_read": sum(result[2] for result in results),
+        "peak_in_flight": peak_in_flight,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "memory": {
+            "traced_peak_bytes": peak_memory - baseline_memory,
+            "per_in_flight_bytes": (peak_memory - baseline_memory) // max(peak_in_flight, 1),
+        },
+    }
+    if bastion is not None:
+        report["bastion_handshakes"] = bastion.auth_attempts
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50, help="in-flight commands; == hosts for a full connect storm")
+    parser.add_argument("--command", default="uptime")
+    parser.add_argument("--handshake-delay", type=float, default=0.0, help="seconds before the SSH banner")
+    parser.add_argument("--command-runtime", type=float, default=0.0, help="seconds per command")
+    parser.add_argument("--output-size", type=int, default=64, help="bytes of stdout per command")
+    parser.add_argument("--auth-failure-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--drop-stage", choices=("connect", "exec"), default="connect")
+    parser.add_argument("--bastion", action="store_true", help="reach every host through one shared jump host")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    behavior = HostBehavior(
+        handshake_delay=args.handshake_delay,
+        command_runtime=args.command_runtime,
+        output_size=args.output_size,
+        auth_failure_rate=args.auth_failure_rate,
+        drop_rate=args.drop_rate,
+        drop_stage=args.drop_stage,
+    )
+    with tempfile.TemporaryDirectory(prefix="ssh-fleet-") as workdir:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'fleet.db')}")
+        os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+        fleet = SimulatedFleet(args.hosts, behavior, seed=args.seed).start()
+        bastion = StubSSHServer().start() if args.bastion else None
+        logging.getLogger().setLevel(logging.CRITICAL)
+        try:
+            report = {"behavior": asdict(behavior), "concurrency": args.concurrency}
+            report.update(run_fleet(fleet, args.concurrency, args.command, bastion))
+        finally:
+            fleet.close()
+            if bastion is not None:
+                bastion.close()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+SSH handshake benchmark: paramiko defaults versus a server connection profile.
+
+Connects repeatedly to an in-process SSH server through a TCP proxy that adds
+a fixed round-trip delay, once the way SSHService used to (AutoAddPolicy,
+agent and key-file probing, default algorithm order) and once through
+SSHService.connect with a ConnectionProfile (pinned auth method, stored host
+key, preferred algorithms).
+
+    python -m benchmarks.ssh_handshake --connections 50 --rtt-ms 40 --stray-keys 2
+
+--stray-keys N stands in for what agent/~/.ssh probing finds on a real app
+host: N private keys the server doesn't accept, offered before the password.
+
+Reports (as JSON) per path: latency percentiles, round trips per connect
+(counted by the proxy as direction changes) and auth attempts seen by the server.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+import paramiko
+
+from benchmarks.api_load import percentile
+from benchmarks.stubs import StubSSHServer
+
+
+class LatencyProxy:
+    """Forwards TCP to target, delaying every chunk by rtt/2 and counting direction changes"""
+
+    def __init__(self, target_host: str, target_port: int, rtt: float):
+        self.target = (target_host, target_port)
+        self.one_way = rtt / 2
+        self.turns = 0
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(64)
+        self.host, self.port = self._sock.getsockname()
+        threading.Thread(target=self._accept_loop, name="latency-proxy", daemon=True).start()
+
+    def close(self) -> None:
+        self._sock.close()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            state = {"last": None}
+            for source, sink, direction in ((client, upstream, "up"), (upstream, client, "down")):
+                threading.Thread(target=self._pump, args=(source, sink, direction, state), daemon=True).start()
+
+    def _pump(self, source: socket.socket, sink: socket.socket, direction: str, state: dict) -> None:
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                with self._lock:
+                    if state["last"] != direction:
+                        state["last"] = direction
+                        self.turns += 1
+                time.sleep(self.one_way)
+                sink.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, sink):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def connect_legacy(host: str, port: int, username: str, password: str, key_files: List[str]) -> paramiko.SSHClient:
+    """The connect path before connection profiles: every paramiko default left on"""
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    sock = socket.create_connection((host, port), timeout=30)
+    client.connect(
+        hostname=host, port=port, username=username, password=password, timeout=30, sock=sock,
+        key_filename=key_files or None
+    )
+    return client
+
+
+def write_stray_keys(directory: str, count: int) -> List[str]:
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"stray_{index}")
+        paramiko.RSAKey.generate(2048).write_private_key_file(path)
+        paths.append(path)
+    return paths
+
+
+def measure(name: str, connect, connections: int, stub: StubSSHServer, proxy: LatencyProxy) -> dict:
+    latencies: List[float] = []
+    attempts_before, turns_before = stub.auth_attempts, proxy.turns
+    for _ in range(connections):
+        start = time.perf_counter()
+        client = connect()
+        latencies.append(time.perf_counter() - start)
+        client.close()
+    # Let the proxy see the teardown before the next path starts counting
+    time.sleep(proxy.one_way * 4 + 0.05)
+    latencies.sort()
+    return {
+        "path": name,
+        "connections": connections,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+        },
+        "round_trips_per_connect": round((proxy.turns - turns_before) / 2 / connections, 1),
+        "auth_attempts_per_connect": round((stub.auth_attempts - attempts_before) / connections, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="simulated network round-trip time")
+    parser.add_argument("--kex", default="curve25519-sha256@libssh.org", help="preferred kex for the profile path")
+    parser.add_argument("--stray-keys", type=int, default=0, help="unaccepted keys the legacy path offers first")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    from ssh_service import ConnectionProfile, SSHService
+
+    stub = StubSSHServer().start()
+    stub.authorized_keys = set()
+    proxy = LatencyProxy(stub.host, stub.port, args.rtt_ms / 1000)
+    keydir = tempfile.TemporaryDirectory(prefix="ssh-handshake-")
+    try:
+        key_files = write_stray_keys(keydir.name, args.stray_keys)
+        # First contact records the host key, as SSHService does for a new server
+        first = SSHService.connect(proxy.host, proxy.port, stub.username, stub.password)
+        server_key = first.get_transport().get_remote_server_key()
+        first.close()
+        profile = ConnectionProfile(
+            auth_method="password",
+            kex_algorithms=[args.kex],
+            host_key=f"{server_key.get_name()} {server_key.get_base64()}",
+        )
+        profile.validate()
+
+        results = [
+            measure("legacy", lambda: connect_legacy(proxy.host, proxy.port, stub.username, stub.password, key_files),
+                    args.connections, stub, proxy),
+            measure("profile", lambda: SSHService.connect(
+                proxy.host, proxy.port, stub.username, stub.password, profile=profile
+            ), args.connections, stub, proxy),
+        ]
+    finally:
+        keydir.cleanup()
+        proxy.close()
+        stub.close()
+
+    report = {"rtt_ms": args.rtt_ms, "stray_keys": args.stray_keys, "results": results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
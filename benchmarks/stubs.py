@@ -0,0 +1,382 @@
+"""In-process stand-ins for the SSH and SMTP servers the API talks to"""
+import base64
+import logging
+import os
+import select
+import socket
+import socketserver
+import threading
+from typing import Callable, Optional, Tuple
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+CommandHandler = Callable[[str], Tuple[bytes, bytes, int]]
+
+_host_key: Optional[paramiko.PKey] = None
+_host_key_lock = threading.Lock()
+
+
+def stub_host_key() -> paramiko.PKey:
+    """One RSA host key per process; generating it is the slow part of starting a stub"""
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+def echo_handler(command: str) -> Tuple[bytes, bytes, int]:
+    return f"ran: {command}\n".encode(), b"", 0
+
+
+class _StubServerInterface(paramiko.ServerInterface):
+    def __init__(self, stub: "StubSSHServer", transport: paramiko.Transport):
+        self.stub = stub
+        self.transport = transport
+        # chanid -> upstream socket for direct-tcpip channels not yet accepted
+        self.forwards = {}
+        self._forward_acceptor: Optional[threading.Thread] = None
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        self.stub.auth_attempts += 1
+        if self.stub.check_password(username, password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        self.stub.auth_attempts += 1
+        if username != self.stub.username:
+            return paramiko.AUTH_FAILED
+        if self.stub.authorized_keys is not None and key.get_base64() not in self.stub.authorized_keys:
+            return paramiko.AUTH_FAILED
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        try:
+            self.forwards[chanid] = socket.create_connection(destination, timeout=10)
+        except OSError:
+            return paramiko.OPEN_FAILED_CONNECT_FAILED
+        if self._forward_acceptor is None:
+            self._forward_acceptor = threading.Thread(target=self._accept_forwards, daemon=True)
+            self._forward_acceptor.start()
+        return paramiko.OPEN_SUCCEEDED
+
+    def _accept_forwards(self) -> None:
+        while self.transport.is_active():
+            channel = self.transport.accept(timeout=1)
+            upstream = self.forwards.pop(channel.get_id(), None) if channel is not None else None
+            if upstream is not None:
+                threading.Thread(target=self.stub.run_forward, args=(channel, upstream), daemon=True).start()
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode("utf-8", errors="replace") if isinstance(command, bytes) else command
+        threading.Thread(target=self.stub.run_exec, args=(channel, command), daemon=True).start()
+        return True
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=self.stub.run_shell, args=(channel,), daemon=True).start()
+        return True
+
+
+def _set_attributes(path: str, attr: paramiko.SFTPAttributes, truncate: Callable[[int], None]) -> None:
+    """
+    Apply SETSTAT/FSETSTAT attributes. Sizes go through truncate:
+    SFTPServer.set_file_attr truncates by reopening the file with "w+",
+    which empties it first.
+    """
+    if attr._flags & attr.FLAG_SIZE:
+        truncate(attr.st_size)
+        attr._flags &= ~attr.FLAG_SIZE
+    paramiko.SFTPServer.set_file_attr(path, attr)
+
+
+class _StubSFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        try:
+            self.writefile.flush()
+            _set_attributes(self.filename, attr, self.writefile.truncate)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class _StubSFTPInterface(paramiko.SFTPServerInterface):
+    """Serves SFTP out of stub.sftp_root; remote paths are taken relative to it"""
+
+    def __init__(self, server, stub: "StubSSHServer", *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = stub.sftp_root
+
+    def _local(self, path: str) -> str:
+        return os.path.join(self.root, self.canonicalize(path).lstrip("/"))
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        local = self._local(path)
+        try:
+            fd = os.open(local, flags | getattr(os, "O_BINARY", 0), 0o644)
+            mode = "r+b" if flags & os.O_RDWR else ("wb" if flags & os.O_WRONLY else "rb")
+            if flags & os.O_APPEND:
+                mode = mode.replace("w", "a").replace("r+", "a+")
+            f = os.fdopen(fd, mode)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        handle = _StubSFTPHandle(flags)
+        handle.filename = local
+        handle.readfile = f
+        handle.writefile = f
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        try:
+            os.replace(self._local(oldpath), self._local(newpath))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    posix_rename = rename
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def chattr(self, path, attr):
+        try:
+            local = self._local(path)
+            _set_attributes(local, attr, lambda size: os.truncate(local, size))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class StubSSHServer:
+    """
+    Minimal paramiko SSH server on localhost.
+
+    Accepts password auth for (username, password) and any public key for
+    username (or only those in authorized_keys, when set). Exec requests are answered by handler(command) -> (stdout, stderr, exit_status).
+    direct-tcpip channels are relayed to their destination, so a stub can act as a jump host.
+    With sftp_root set, the sftp subsystem serves files from that directory.
+    """
+
+    def __init__(
+        self,
+        username: str = "bench",
+        password: str = "bench",
+        handler: CommandHandler = echo_handler,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        sftp_root: Optional[str] = None
+    ):
+        self.username = username
+        self.password = password
+        self.handler = handler
+        self.sftp_root = sftp_root
+        self.auth_attempts = 0
+        # Base64 public keys accepted for username; None accepts any key
+        self.authorized_keys: Optional[set] = None
+        self.host_key = stub_host_key()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(128)
+        self.host, self.port = self._sock.getsockname()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._accept_loop, name=f"stub-ssh-{self.port}", daemon=True)
+
+    def start(self) -> "StubSSHServer":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._closed.set()
+        self._sock.close()
+
+    def check_password(self, username: str, password: str) -> bool:
+        return username == self.username and password == self.password
+
+    def _accept_loop(self) -> None:
+        while not self._closed.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(client,), daemon=True).start()
+
+    @property
+    def listener(self) -> socket.socket:
+        return self._sock
+
+    def serve(self, client: socket.socket) -> None:
+        """Run the SSH server side of one accepted connection"""
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        if self.sftp_root:
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _StubSFTPInterface, self)
+        try:
+            transport.start_server(server=_StubServerInterface(self, transport))
+        except Exception as e:
+            logger.debug(f"Stub SSH handshake failed: {e}")
+            transport.close()
+
+    def run_exec(self, channel: paramiko.Channel, command: str) -> None:
+        try:
+            stdout, stderr, exit_status = self.handler(command)
+            if stdout:
+                channel.sendall(stdout)
+            if stderr:
+                channel.sendall_stderr(stderr)
+            channel.send_exit_status(exit_status)
+            # This thread starts before paramiko acks the exec request; closing
+            # first would race that ack. Send EOF and let the client close.
+            channel.shutdown_write()
+            channel.settimeout(10)
+            while channel.recv(32768):
+                pass
+        except Exception as e:
+            logger.debug(f"Stub SSH exec failed: {e}")
+        finally:
+            channel.close()
+
+    def run_forward(self, channel: paramiko.Channel, upstream: socket.socket) -> None:
+        """Relay a direct-tcpip channel, as sshd does for a jump host"""
+        upstream.settimeout(None)
+        try:
+            while True:
+                readable, _, _ = select.select([channel, upstream], [], [])
+                if channel in readable:
+                    data = channel.recv(32768)
+                    if not data:
+                        break
+                    upstream.sendall(data)
+                if upstream in readable:
+                    data = upstream.recv(32768)
+                    if not data:
+                        break
+                    channel.sendall(data)
+        except OSError as e:
+            logger.debug(f"Stub SSH forward ended: {e}")
+        finally:
+            upstream.close()
+            channel.close()
+
+    def run_shell(self, channel: paramiko.Channel) -> None:
+        """Line-oriented shell: echoes keystrokes, runs each line through handler, "exit" ends it"""
+        line = b""
+        try:
+            channel.sendall(b"$ ")
+            while True:
+                data = channel.recv(1024)
+                if not data:
+                    return
+                channel.sendall(data)
+                line += data
+                while b"\r" in line or b"\n" in line:
+                    command, _, line = line.replace(b"\r\n", b"\n").replace(b"\r", b"\n").partition(b"\n")
+                    command = command.decode("utf-8", errors="replace").strip()
+                    channel.sendall(b"\r\n")
+                    if command == "exit":
+                        channel.send_exit_status(0)
+                        return
+                    if command:
+                        stdout, stderr, _ = self.handler(command)
+                        channel.sendall((stdout + stderr).replace(b"\n", b"\r\n"))
+                    channel.sendall(b"$ ")
+        except Exception as e:
+            logger.debug(f"Stub SSH shell failed: {e}")
+        finally:
+            channel.close()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self._reply("220 stub-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode(errors="replace").strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250-stub-smtp")
+                self._reply("250-AUTH PLAIN LOGIN")
+                self._reply("250 OK")
+            elif verb == "AUTH":
+                parts = line.decode(errors="replace").split()
+                if parts[1].upper() == "LOGIN":
+                    for prompt in (b"Username:", b"Password:"):
+                        self._reply(f"334 {base64.b64encode(prompt).decode()}")
+                        self.rfile.readline()
+                elif len(parts) < 3:
+                    self._reply("334 ")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                self.server.messages += 1
+                self._reply("250 OK: queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Local SMTP server that accepts any AUTH and discards every message, counting them"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = 0
+        self.host, self.port = self.server_address
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-smtp", daemon=True)
+
+    def start(self) -> "SMTPSink":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
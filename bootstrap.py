@@ -0,0 +1,102 @@
+import importlib
+import importlib.util
+import logging
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+_started_at = time.perf_counter()
+_import_times: Dict[str, float] = {}
+_phase_times: Dict[str, float] = {}
+_lazy_modules: Dict[str, object] = {}
+_ready_ms = None
+
+
+class _LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that imports it on first attribute access.
+
+    importlib.util.LazyLoader isn't thread-safe before Python 3.12: threads
+    that touch a module while another is executing it see a half-initialised
+    module (AttributeError). Here the first access imports the real module
+    under a lock and every other thread waits for it; after that attributes
+    are looked up on the loaded module without locking.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lock"] = threading.Lock()
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        with self._lock:
+            if self._module is None:
+                self.__dict__["_module"] = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attribute)
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+
+def lazy_import(name: str):
+    """
+    Return a module that is only imported on first attribute access.
+
+    Used for heavy dependencies (paramiko, PIL, jose/cryptography, ...) that
+    most requests never touch, so they stay off the cold-start path. Safe to
+    first touch from many threadpool threads at once.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    module = _LazyModule(name)
+    _lazy_modules[name] = module
+    return module
+
+
+def timed_import(name: str):
+    """Import a module and record how long it took for the startup report"""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_times[name] = (time.perf_counter() - start) * 1000
+    return module
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Time one initialisation phase for the startup report"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        _phase_times[name] = elapsed
+        logger.info(f"Startup phase {name} took {elapsed:.1f}ms")
+
+
+def mark_ready() -> None:
+    """Record the time from the first app import until startup finished"""
+    global _ready_ms
+    _ready_ms = (time.perf_counter() - _started_at) * 1000
+    logger.info(f"Application ready {_ready_ms:.1f}ms after first import")
+
+
+def startup_report() -> dict:
+    lazy = {name: module.loaded for name, module in _lazy_modules.items()}
+    return {
+        "ready_ms": round(_ready_ms, 1) if _ready_ms is not None else None,
+        "imports_ms": {name: round(ms, 1) for name, ms in _import_times.items()},
+        "phases_ms": {name: round(ms, 1) for name, ms in _phase_times.items()},
+        "lazy_modules_loaded": lazy,
+    }
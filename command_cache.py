@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from config import settings
+from metrics import COMMAND_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# (success, output, error, exit_status) as returned by SSHService.execute_command
+CommandResult = Tuple[bool, Optional[str], Optional[str], Optional[int]]
+
+
+def normalize_command(command: str) -> str:
+    return " ".join(command.split())
+
+
+class _Call:
+    """One in-flight execution that concurrent identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[CommandResult] = None
+        self.error: Optional[BaseException] = None
+
+
+class CommandCache:
+    """
+    TTL cache with request coalescing in front of SSHService.execute_command.
+
+    Only commands in COMMAND_CACHE_ALLOWLIST are cached. Concurrent requests
+    for the same (server, command) share a single remote execution; callers
+    run in the threadpool, so waiting blocks a worker thread, not the event loop.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, CommandResult]]" = OrderedDict()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    @staticmethod
+    def ttl_for(command: str) -> Optional[float]:
+        """TTL in seconds when the command is on the allowlist, otherwise None"""
+        if not settings.COMMAND_CACHE_ENABLED:
+            return None
+        return settings.command_cache_allowlist.get(normalize_command(command))
+
+    def _fresh(self, key: Hashable) -> Optional[CommandResult]:
+        """Unexpired cached result for key, counted as a hit. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            COMMAND_CACHE_REQUESTS.inc("hit")
+            return entry[1]
+        return None
+
+    def lookup(self, server_id: int, command: str) -> Optional[CommandResult]:
+        """Cached result without executing or waiting, for callers that want to skip admission on a hit"""
+        if self.ttl_for(command) is None:
+            return None
+        with self._lock:
+            return self._fresh((server_id, normalize_command(command)))
+
+    def execute(
+        self,
+        server_id: int,
+        command: str,
+        run: Callable[[], CommandResult]
+    ) -> Tuple[CommandResult, bool]:
+        """Return (result, served_from_cache). run() is only called on a miss."""
+        ttl = self.ttl_for(command)
+        if ttl is None:
+            return run(), False
+
+        key = (server_id, normalize_command(command))
+        with self._lock:
+            result = self._fresh(key)
+            if result is not None:
+                return result, True
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COMMAND_CACHE_REQUESTS.inc("coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        COMMAND_CACHE_REQUESTS.inc("miss")
+        try:
+            call.result = run()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                # Failed connections and non-zero exits are shared with waiters but not kept
+                if call.result is not None and call.result[0]:
+                    self._entries[key] = (time.monotonic() + ttl, call.result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            call.done.set()
+        return call.result, False
+
+    def invalidate_server(self, server_id: int) -> None:
+        """Drop cached results for a server whose connection details changed or which was deleted"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == server_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+command_cache = CommandCache(max_entries=settings.COMMAND_CACHE_MAX_ENTRIES)
@@ -0,0 +1,111 @@
+import csv
+import io
+import logging
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+import orjson
+from sqlalchemy import select
+
+from config import settings
+from database import SessionLocal
+from fast_json import schema_columns
+from models import CommandLog
+from schemas import CommandLogResponse
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _batches(
+    user_id: int,
+    server_id: Optional[int],
+    since: Optional[datetime],
+    until: Optional[datetime]
+) -> Iterator[List]:
+    """
+    A user's command_logs rows, oldest first, EXPORT_BATCH_SIZE at a time.
+
+    yield_per streams from a server-side cursor on PostgreSQL (fetchmany
+    batches on SQLite), so only one batch is ever held in memory. The
+    session lives as long as the export and is closed when it ends or is
+    abandoned.
+    """
+    statement = select(*schema_columns(CommandLog, CommandLogResponse)).where(
+        CommandLog.user_id == user_id
+    ).order_by(CommandLog.id)
+    if server_id is not None:
+        statement = statement.where(CommandLog.server_id == server_id)
+    if since is not None:
+        statement = statement.where(CommandLog.execution_time >= since)
+    if until is not None:
+        statement = statement.where(CommandLog.execution_time < until)
+
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CommandLogResponse.model_fields)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(row._asdict(), option=orjson.OPT_UTC_Z) + b"\n" for row in rows)
+
+
+def iter_export(
+    user_id: int,
+    export_format: str,
+    compress: bool = False,
+    server_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Iterator[bytes]:
+    """
+    Command history as NDJSON or CSV (with header), gzipped when compress is set.
+
+    A plain generator: StreamingResponse drives it from the threadpool, so
+    the database reads and encoding never run on the event loop.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    exported = 0
+    started = datetime.utcnow()
+
+    def output(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    if export_format == "csv":
+        yield output(_encode_csv([], header=True))
+    for batch in _batches(user_id, server_id, since, until):
+        chunk = output(_encode_csv(batch) if export_format == "csv" else _encode_ndjson(batch))
+        exported += len(batch)
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+    logger.info(
+        f"Exported {exported} command logs for user {user_id} as {export_format}"
+        f"{' (gzip)' if compress else ''} in {(datetime.utcnow() - started).total_seconds():.1f}s"
+    )
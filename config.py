@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List, Optional
 import os
 
 
@@ -66,15 +66,162 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:8080"
     
+    # Production server (serve.py). WORKERS=0 starts one worker per CPU core. Keep-alive should
+    # outlast the load balancer's idle timeout so the proxy, not the app, closes idle connections.
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WORKERS: int = 0
+    KEEPALIVE_TIMEOUT: int = 75
+    # Seconds after SIGTERM to finish in-flight commands, transfers and emails before closing pools
+    SHUTDOWN_DRAIN_TIMEOUT: float = 25
+    
+    # Startup: connectivity check and table listing in init_db. Unset means on in DEBUG only.
+    VERIFY_DB_SCHEMA: Optional[bool] = None
+    
+    @property
+    def verify_db_schema(self) -> bool:
+        return self.DEBUG if self.VERIFY_DB_SCHEMA is None else self.VERIFY_DB_SCHEMA
+    
+    # Comma-separated usernames allowed to use /api/admin endpoints
+    ADMIN_USERNAMES: str = ""
+    
+    @property
+    def admin_usernames_list(self) -> List[str]:
+        return [name.strip() for name in self.ADMIN_USERNAMES.split(',') if name.strip()]
+    
+    # Profiling (opt-in). A threshold of 0 disables the slow query log.
+    SLOW_QUERY_THRESHOLD_MS: float = 0
+    PROFILING_ENABLED: bool = False
+    PROFILE_LATENCY_THRESHOLD_MS: float = 1000
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5
+    PROFILE_HISTORY_SIZE: int = 20
+    PROFILE_HEADER: str = "X-Profile"
+    
     # File Upload
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 5242880  
     ALLOWED_EXTENSIONS: str = "jpg,jpeg,png,gif" 
+    UPLOAD_CHUNK_SIZE: int = 65536
+    MAX_IMAGE_DIMENSION: int = 8000
+    MAX_IMAGE_PIXELS: int = 40000000
+    PHOTO_SIZES: str = "500,200,64"
+    PHOTO_WORKERS: int = 2
+    PHOTO_GC_GRACE_SECONDS: int = 60
+    PHOTO_GC_SWEEP_INTERVAL: int = 3600
+    PHOTO_CACHE_MAX_AGE: int = 31536000
     
     @property
     def allowed_extensions_list(self) -> List[str]:
         return [ext.strip().lower() for ext in self.ALLOWED_EXTENSIONS.split(',') if ext.strip()]
     
+    @property
+    def photo_sizes_list(self) -> List[int]:
+        sizes = {int(size) for size in self.PHOTO_SIZES.split(',') if size.strip()}
+        return sorted(sizes, reverse=True)
+    
+
+    # Read-only command cache (opt-in). Allowlist entries are "command" or "command=ttl_seconds".
+    COMMAND_CACHE_ENABLED: bool = False
+    COMMAND_CACHE_ALLOWLIST: str = "uptime,df -h,free -m"
+    COMMAND_CACHE_DEFAULT_TTL: float = 10
+    COMMAND_CACHE_MAX_ENTRIES: int = 1024
+    
+    @property
+    def command_cache_allowlist(self) -> Dict[str, float]:
+        allowlist = {}
+        for entry in self.COMMAND_CACHE_ALLOWLIST.split(','):
+            command, _, ttl = entry.partition('=')
+            command = " ".join(command.split())
+            if command:
+                allowlist[command] = float(ttl) if ttl.strip() else self.COMMAND_CACHE_DEFAULT_TTL
+        return allowlist
+    
+
+    # SSH connection defaults, overridable per server. Algorithm lists are comma-separated, most preferred first.
+    SSH_CONNECT_TIMEOUT: float = 30
+    SSH_BANNER_TIMEOUT: float = 15
+    SSH_AUTH_TIMEOUT: float = 30
+    SSH_KEX_ALGORITHMS: str = ""
+    SSH_CIPHERS: str = ""
+    SSH_HOST_KEY_ALGORITHMS: str = ""
+    # Jump hosts: one shared connection per bastion, closed after this long with no tunnelled connections
+    SSH_BASTION_IDLE_TIMEOUT: float = 300
+    SSH_BASTION_KEEPALIVE_INTERVAL: int = 30
+    
+
+    # Admission limits on concurrent SSH work (per process) and how long requests may queue for a slot
+    ADMISSION_MAX_GLOBAL: int = 64
+    ADMISSION_MAX_PER_HOST: int = 4
+    ADMISSION_MAX_PER_USER: int = 8
+    ADMISSION_QUEUE_TIMEOUT: float = 30
+    ADMISSION_MAX_QUEUED: int = 1000
+    ADMISSION_MAX_QUEUED_PER_USER: int = 50
+    ADMISSION_INTERACTIVE_WEIGHT: int = 4
+    # Worker threads on top of one per global slot, for non-SSH work (database, bcrypt, compression)
+    THREADPOOL_EXTRA_THREADS: int = 40
+    
+
+    # Command scheduler: due schedules are polled every SCHEDULER_POLL_INTERVAL seconds
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_POLL_INTERVAL: float = 5
+    SCHEDULER_MAX_CONCURRENCY: int = 8
+    SCHEDULER_MAX_JITTER_SECONDS: int = 300
+    # A target marked running for longer than this is taken to belong to a worker that died
+    SCHEDULER_RUN_MARK_TIMEOUT: float = 3600
+    
+
+    # Interactive shell sessions. Output is buffered up to SHELL_OUTPUT_QUEUE_SIZE reads per session
+    # before the SSH channel is left unread (and the remote side blocks).
+    SHELL_MAX_SESSIONS_PER_USER: int = 5
+    SHELL_IDLE_TIMEOUT: int = 900
+    SHELL_KEEPALIVE_INTERVAL: int = 30
+    SHELL_OUTPUT_QUEUE_SIZE: int = 64
+    SHELL_READ_SIZE: int = 32768
+    SHELL_TRANSCRIPT_MAX_BYTES: int = 1048576
+    SHELL_TERM: str = "xterm-256color"
+    
+
+    # SFTP transfers: chunk size per request and how many reads are kept in flight
+    SFTP_CHUNK_SIZE: int = 32768
+    SFTP_MAX_CONCURRENT_REQUESTS: int = 16
+    # Directory sync: each user's bundles are staged in SYNC_SOURCE_DIR/<user id>/<bundle>. Changed files
+    # are compared in SYNC_BLOCK_SIZE blocks hashed on the remote host, with SYNC_HASH_BATCH_BYTES of
+    # paths per hash command, and SYNC_MAX_CONCURRENCY files in flight at once
+    SYNC_SOURCE_DIR: str = "sync"
+    SYNC_BLOCK_SIZE: int = 131072
+    SYNC_HASH_BATCH_BYTES: int = 65536
+    SYNC_HASH_TIMEOUT: float = 300
+    SYNC_MAX_CONCURRENCY: int = 8
+    
+    # Server facts: collected again once the last attempt is FACTS_MAX_AGE seconds old; stale servers
+    # are refreshed in the background every FACTS_REFRESH_INTERVAL seconds (0 disables that)
+    FACTS_MAX_AGE: int = 3600
+    FACTS_REFRESH_INTERVAL: float = 300
+    FACTS_MAX_CONCURRENCY: int = 16
+    
+    # Command history export: rows fetched from the database (and encoded) per batch
+    EXPORT_BATCH_SIZE: int = 1000
+    
+    # Response compression (brotli when installed and accepted, else gzip) for bodies of at least this many bytes
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Deduplicated command output: how often unreferenced blobs are collected, and how long
+    # a blob must have gone unused first (covers transactions still writing a log that uses it)
+    OUTPUT_BLOB_GC_INTERVAL: int = 3600
+    OUTPUT_BLOB_GC_GRACE: int = 3600
+    
+    # Live activity feed: events buffered per subscriber before it's disconnected as too slow,
+    # rows replayed on reconnect, feeds per user and the keep-alive interval in seconds
+    FEED_BUFFER_SIZE: int = 256
+    FEED_REPLAY_LIMIT: int = 500
+    FEED_MAX_SUBSCRIBERS_PER_USER: int = 10
+    FEED_KEEPALIVE_INTERVAL: float = 15
+    
+    # Execution analytics: longest since/until window one request may cover
+    ANALYTICS_MAX_RANGE_DAYS: int = 92
+    
 
     BLOCKED_COMMANDS: List[str] = [
         "rm -rf /",
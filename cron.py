@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, Tuple
+
+# (name, min, max) for the five standard fields
+_FIELDS: Tuple[Tuple[str, int, int], ...] = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),
+)
+
+_NAMES = {
+    3: {name: index + 1 for index, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])},
+    4: {name: index for index, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])},
+}
+
+_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# Far enough to cover any valid expression (Feb 29 on a given weekday repeats within 28 years)
+_SEARCH_LIMIT = timedelta(days=366 * 29)
+
+
+def _parse_value(token: str, position: int) -> int:
+    value = _NAMES.get(position, {}).get(token.lower())
+    if value is not None:
+        return value
+    if not token.isdigit():
+        raise ValueError(f"Invalid {_FIELDS[position][0]} value: {token!r}")
+    return int(token)
+
+
+def _parse_field(text: str, position: int) -> FrozenSet[int]:
+    name, low, high = _FIELDS[position]
+    values = set()
+    for part in text.split(","):
+        spec, _, step_text = part.partition("/")
+        step = 1
+        if step_text:
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ValueError(f"Invalid {name} step: {part!r}")
+            step = int(step_text)
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start_text, end_text = spec.split("-", 1)
+            start, end = _parse_value(start_text, position), _parse_value(end_text, position)
+        else:
+            start = _parse_value(spec, position)
+            end = high if step_text else start
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise ValueError(f"{name.capitalize()} out of range: {part!r}")
+        values.update(range(start, end + 1, step))
+    # Both 0 and 7 mean Sunday
+    if position == 4 and 7 in values:
+        values.discard(7)
+        values.add(0)
+    return frozenset(values)
+
+
+class CronExpression:
+    """
+    Standard five-field cron expression (minute hour day-of-month month day-of-week).
+
+    Supports *, lists, ranges, steps, month/day names and the @hourly/@daily/...
+    aliases. As in cron, when both day fields are restricted a day matches if
+    either one does. Times are naive UTC.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = _ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError("Cron expression must have 5 fields: minute hour day-of-month month day-of-week")
+        parsed: List[FrozenSet[int]] = [_parse_field(field, index) for index, field in enumerate(fields)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        # datetime.weekday() is Monday=0; cron is Sunday=0
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after moment"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + _SEARCH_LIMIT
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = candidate.year + candidate.month // 12, candidate.month % 12 + 1
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __str__(self) -> str:
+        return self.expression
@@ -1,9 +1,12 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
+from bootstrap import startup_phase
+from metrics import DB_QUERY_DURATION, Gauge
 import logging
 import os
+import time
 
 logger = logging.getLogger(__name__)
 database_url = settings.DATABASE_URL
@@ -28,6 +31,49 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start_time = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start_time
+    statement_type = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    DB_QUERY_DURATION.observe(elapsed, statement_type)
+    
+    if settings.SLOW_QUERY_THRESHOLD_MS and elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f}ms): {' '.join(statement.split())[:500]} "
+            f"params={_parameters_shape(parameters, executemany)}"
+        )
+
+
+def _parameters_shape(parameters, executemany: bool) -> str:
+    """Describe bound parameters by type and size only, never by value"""
+    def describe(params):
+        if isinstance(params, dict):
+            return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+        if isinstance(params, (list, tuple)):
+            return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+        return type(params).__name__
+    
+    if executemany and parameters:
+        return f"{len(parameters)} x {describe(parameters[0])}"
+    return describe(parameters)
+
+
+def _pool_stats():
+    pool = engine.pool
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        stat = getattr(pool, name, None)
+        if callable(stat):
+            yield (name,), stat()
+
+
+Gauge("db_pool_connections", "SQLAlchemy connection pool state", ("state",), callback=_pool_stats)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -37,11 +83,12 @@ def get_db():
 
 
 def init_db():
+    verify = settings.verify_db_schema
     try:
         # Test connection for PostgreSQL
-        if "sqlite" not in database_url.lower():
+        if verify and "sqlite" not in database_url.lower():
             try:
-                with engine.connect() as conn:
+                with startup_phase("db_connect_check"), engine.connect() as conn:
                     result = conn.execute(text("SELECT current_database(), current_schema()"))
                     row = result.fetchone()
                     logger.info(f"Connected to PostgreSQL database: {row[0]}, schema: {row[1]}")
@@ -53,13 +100,14 @@ def init_db():
                 raise
         
         # Create tables
-        Base.metadata.create_all(bind=engine)
+        with startup_phase("db_create_all"):
+            Base.metadata.create_all(bind=engine)
         logger.info("Database tables created/verified successfully")
         
         # Verify tables were created (for PostgreSQL)
-        if "sqlite" not in database_url.lower():
+        if verify and "sqlite" not in database_url.lower():
             try:
-                with engine.connect() as conn:
+                with startup_phase("db_list_tables"), engine.connect() as conn:
                     result = conn.execute(text("""
                         SELECT table_name 
                         FROM information_schema.tables 
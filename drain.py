@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from config import settings
+from metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+
+class DrainTracker:
+    """
+    In-flight work that a graceful shutdown waits for.
+
+    begin() puts the process into draining: check() refuses new SSH work
+    with a 503 so clients retry elsewhere, /health reports 503 so the load
+    balancer stops routing here, and the on_begin callbacks run (e.g. closing
+    shell sessions, whose sockets would otherwise hold the drain open).
+    wait() returns when tracked work has finished or SHUTDOWN_DRAIN_TIMEOUT
+    after begin() has passed. Per process; call on the event loop.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.deadline: Optional[float] = None
+        self._in_flight: Dict[str, int] = {}
+        self._idle: Optional[asyncio.Event] = None
+        self._callbacks: List[Callable[[], None]] = []
+
+    def in_flight(self, kind: Optional[str] = None) -> int:
+        if kind is None:
+            return sum(self._in_flight.values())
+        return self._in_flight.get(kind, 0)
+
+    def reset(self) -> None:
+        """Accept work again; for an app started more than once in one process (tests)"""
+        self.draining = False
+        self.deadline = None
+        self._callbacks.clear()
+
+    def on_begin(self, callback: Callable[[], None]) -> None:
+        self._callbacks.append(callback)
+
+    def begin(self) -> None:
+        if self.draining:
+            return
+        self.draining = True
+        self.deadline = time.monotonic() + settings.SHUTDOWN_DRAIN_TIMEOUT
+        logger.info(f"Draining: refusing new work, {self.in_flight()} task(s) in flight")
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Drain callback failed: {e}")
+
+    def check(self) -> None:
+        """Refuse new work once draining has begun"""
+        if self.draining:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is restarting; retry shortly",
+                headers={"Retry-After": "5"}
+            )
+
+    @asynccontextmanager
+    async def track(self, kind: str):
+        self._in_flight[kind] = self._in_flight.get(kind, 0) + 1
+        if self._idle is not None:
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight[kind] -= 1
+            if not self.in_flight() and self._idle is not None:
+                self._idle.set()
+
+    async def wait(self) -> bool:
+        """True when everything finished, False when the deadline cut the wait short"""
+        self.begin()
+        if not self.in_flight():
+            return True
+        self._idle = asyncio.Event()
+        remaining = max(self.deadline - time.monotonic(), 0)
+        logger.info(f"Waiting up to {remaining:.0f}s for {self._in_flight} to finish")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=remaining)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain deadline passed with work still in flight: {self._in_flight}")
+            return False
+
+
+async def run_tracked(kind: str, func: Callable, *args, **kwargs):
+    """Run a blocking callable in the threadpool as tracked work (e.g. from BackgroundTasks)"""
+    async with drain.track(kind):
+        return await run_in_threadpool(func, *args, **kwargs)
+
+
+drain = DrainTracker()
+
+Gauge("draining", "1 while the process is draining for shutdown", callback=lambda: [((), int(drain.draining))])
+Gauge(
+    "drain_in_flight", "Work a graceful shutdown waits for, by kind", ("kind",),
+    callback=lambda: [((kind,), count) for kind, count in drain._in_flight.items()]
+)
@@ -2,9 +2,8 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 from config import settings
+from metrics import EMAIL_SEND_DURATION, EMAIL_SENT
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,7 +22,10 @@ class EmailService:
 
         if settings.SENDGRID_API_KEY and settings.SENDGRID_API_KEY != "your-sendgrid-api-key-here":
             logger.info("Attempting to send email via SendGrid")
-            return EmailService._send_via_sendgrid(to_email, subject, html_content, text_content)
+            with EMAIL_SEND_DURATION.time("sendgrid"):
+                sent = EmailService._send_via_sendgrid(to_email, subject, html_content, text_content)
+            EMAIL_SENT.inc("sendgrid", "success" if sent else "failure")
+            return sent
         
 
         smtp_host = settings.smtp_host
@@ -34,14 +36,21 @@ class EmailService:
         
         if smtp_host and smtp_user and smtp_password:
             logger.info(f"Attempting to send email via SMTP to {to_email}")
-            return EmailService._send_via_smtp(to_email, subject, html_content, text_content)
+            with EMAIL_SEND_DURATION.time("smtp"):
+                sent = EmailService._send_via_smtp(to_email, subject, html_content, text_content)
+            EMAIL_SENT.inc("smtp", "success" if sent else "failure")
+            return sent
         
+        EMAIL_SENT.inc("none", "not_configured")
         logger.warning("No email service configured. Email not sent.")
         logger.warning(f"SMTP Config - Host: {smtp_host}, User: {smtp_user}, Password: {'Set' if smtp_password else 'Not Set'}")
         return False
     
     @staticmethod
     def _send_via_sendgrid(to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> bool:
+        # Imported on first use: sendgrid is only needed when an API key is configured
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
         try:
             message = Mail(
                 from_email=(settings.EMAIL_FROM, settings.EMAIL_FROM_NAME),
@@ -0,0 +1,220 @@
+"""
+Server inventory: OS, kernel, CPU, memory, disk and uptime per server.
+
+Facts are gathered with one batched command per server (FACTS_COMMAND) and
+kept in server_facts, so inventory queries read the database instead of
+SSHing into the fleet. Refreshes are incremental: only servers whose last
+attempt is older than FACTS_MAX_AGE are collected, FACTS_MAX_CONCURRENCY at
+a time in the batch admission lane. Servers are claimed by moving
+attempted_at forward with a compare-and-set, as the scheduler claims
+schedules, so several workers (or a manual refresh racing the background
+one) never collect the same server twice; a failed attempt waits out
+FACTS_MAX_AGE like a successful one.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from admission import BATCH, admission, host_key
+from config import settings
+from database import SessionLocal
+from drain import drain
+from metrics import FACTS_COLLECTIONS
+from models import Server, ServerFacts
+from ssh_service import ExecutionTimings, SSHService
+
+logger = logging.getLogger(__name__)
+
+# Each section is introduced by an "@@name" line; missing tools just leave their section empty
+FACTS_COMMAND = "; ".join([
+    "echo @@uname", "uname -snrm",
+    "echo @@os-release", "cat /etc/os-release 2>/dev/null",
+    "echo @@nproc", "(nproc || getconf _NPROCESSORS_ONLN) 2>/dev/null",
+    "echo @@cpuinfo", "grep -m1 '^model name' /proc/cpuinfo 2>/dev/null",
+    "echo @@meminfo", "grep -E '^(MemTotal|MemAvailable):' /proc/meminfo 2>/dev/null",
+    "echo @@uptime", "cat /proc/uptime 2>/dev/null",
+    "echo @@df", "df -Pk / 2>/dev/null",
+])
+
+
+def _kilobytes(value: Optional[str]) -> Optional[int]:
+    """Bytes from a count of 1024-byte units"""
+    try:
+        return int(value) * 1024
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_facts(output: str) -> Dict:
+    """ServerFacts column values from FACTS_COMMAND's output; facts it didn't report are None"""
+    sections: Dict[str, List[str]] = {}
+    lines: List[str] = []
+    for line in output.splitlines():
+        if line.startswith("@@"):
+            lines = sections.setdefault(line[2:].strip(), [])
+        elif line.strip():
+            lines.append(line.strip())
+
+    def first(name: str) -> str:
+        return sections[name][0] if sections.get(name) else ""
+
+    def meminfo(key: str) -> Optional[int]:
+        value = memory.get(key, "").split()  # "16314112 kB"
+        return _kilobytes(value[0]) if value else None
+
+    uname = first("uname").split()  # kernel name, hostname, release, machine
+    os_release = dict(line.split("=", 1) for line in sections.get("os-release", []) if "=" in line)
+    memory = dict(line.split(":", 1) for line in sections.get("meminfo", []) if ":" in line)
+    # "Filesystem 1024-blocks Used Available Capacity Mounted on", then the root filesystem
+    df = sections["df"][-1].split() if len(sections.get("df", [])) > 1 else []
+    uptime = first("uptime").split()
+    nproc = first("nproc")
+    return {
+        "hostname": uname[1] if len(uname) == 4 else None,
+        "os_name": os_release.get("NAME", "").strip("\"'") or (uname[0] if uname else None),
+        "os_version": os_release.get("VERSION_ID", "").strip("\"'") or None,
+        "kernel": uname[2] if len(uname) == 4 else None,
+        "architecture": uname[3] if len(uname) == 4 else None,
+        "cpu_count": int(nproc) if nproc.isdigit() else None,
+        "cpu_model": first("cpuinfo").partition(":")[2].strip() or None,
+        "memory_total": meminfo("MemTotal"),
+        "memory_available": meminfo("MemAvailable"),
+        "disk_total": _kilobytes(df[1]) if len(df) > 3 else None,
+        "disk_used": _kilobytes(df[2]) if len(df) > 3 else None,
+        "disk_available": _kilobytes(df[3]) if len(df) > 3 else None,
+        "uptime_seconds": float(uptime[0]) if uptime and uptime[0].replace(".", "", 1).isdigit() else None,
+    }
+
+
+def claim_stale(
+    user_id: Optional[int] = None,
+    server_ids: Optional[Sequence[int]] = None,
+    force: bool = False
+) -> List[Server]:
+    """
+    Servers (detached) whose facts this process should collect now: those
+    never attempted or last attempted over FACTS_MAX_AGE ago (or all of
+    them, with force), minus any another refresh claimed first.
+    """
+    now = datetime.utcnow()
+    cutoff = now if force else now - timedelta(seconds=settings.FACTS_MAX_AGE)
+    db = SessionLocal()
+    try:
+        query = db.query(Server.id, Server.user_id, ServerFacts.id, ServerFacts.attempted_at).outerjoin(
+            ServerFacts, ServerFacts.server_id == Server.id
+        ).filter(
+            or_(Server.password.isnot(None), Server.ssh_key.isnot(None)),
+            or_(ServerFacts.attempted_at.is_(None), ServerFacts.attempted_at < cutoff)
+        )
+        if user_id is not None:
+            query = query.filter(Server.user_id == user_id)
+        if server_ids is not None:
+            query = query.filter(Server.id.in_(server_ids))
+
+        claimed = []
+        for server_id, server_user_id, facts_id, attempted_at in query.all():
+            if facts_id is None:
+                try:
+                    with db.begin_nested():
+                        db.add(ServerFacts(user_id=server_user_id, server_id=server_id, attempted_at=now))
+                except IntegrityError:
+                    continue
+            else:
+                previous = ServerFacts.attempted_at.is_(None) if attempted_at is None else ServerFacts.attempted_at == attempted_at
+                won = db.query(ServerFacts).filter(ServerFacts.id == facts_id, previous).update(
+                    {"attempted_at": now}, synchronize_session=False
+                )
+                if not won:
+                    continue
+            claimed.append(server_id)
+        db.commit()
+
+        servers = db.query(Server).filter(Server.id.in_(claimed)).all() if claimed else []
+        for server in servers:
+            db.expunge(server)
+        return servers
+    finally:
+        db.close()
+
+
+def collect(server: Server) -> bool:
+    """Run FACTS_COMMAND on server and store what it reported (or the error); True on success"""
+    success, output, error, exit_status = SSHService.execute_on_server(server, FACTS_COMMAND, ExecutionTimings())
+    # The exit status is whichever probe ran last; any output at all means the host answered
+    if output and "@@uname" in output:
+        values = {**parse_facts(output), "collected_at": datetime.utcnow(), "error": None}
+        FACTS_COLLECTIONS.inc("success")
+    else:
+        values = {"error": error or f"Facts command exited with status {exit_status}"}
+        FACTS_COLLECTIONS.inc("failed")
+        logger.warning(f"Collecting facts from {server.host} failed: {values['error']}")
+
+    db = SessionLocal()
+    try:
+        db.query(ServerFacts).filter(ServerFacts.server_id == server.id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return "collected_at" in values
+
+
+class FactsCollector:
+    """Collects stale facts every FACTS_REFRESH_INTERVAL seconds, and on demand through refresh()"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.FACTS_REFRESH_INTERVAL)
+            if drain.draining:
+                return
+            try:
+                counts = await self.refresh()
+                if counts["refreshed"] or counts["failed"]:
+                    logger.info(f"Refreshed facts for {counts['refreshed']} server(s), {counts['failed']} failed")
+            except Exception as e:
+                logger.error(f"Facts refresh failed: {e}")
+
+    async def refresh(
+        self,
+        user_id: Optional[int] = None,
+        server_ids: Optional[Sequence[int]] = None,
+        force: bool = False
+    ) -> Dict[str, int]:
+        """Collect facts for the stale servers (of user_id, among server_ids); how many succeeded and failed"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.FACTS_MAX_CONCURRENCY)
+        servers = await run_in_threadpool(claim_stale, user_id, server_ids, force)
+        results = await asyncio.gather(*[self._collect(server) for server in servers])
+        return {"refreshed": results.count(True), "failed": results.count(False)}
+
+    async def _collect(self, server: Server) -> bool:
+        try:
+            async with self._semaphore, admission.slot(server.user_id, host_key(server), BATCH), drain.track("facts"):
+                return await run_in_threadpool(collect, server)
+        except HTTPException as e:
+            logger.warning(f"Facts collection on server {server.id} not admitted: {e.detail}")
+        except Exception as e:
+            logger.error(f"Facts collection on server {server.id} failed: {e}")
+        return False
+
+
+facts_collector = FactsCollector()
@@ -0,0 +1,49 @@
+"""
+orjson responses for large list endpoints.
+
+Rows are selected as plain column tuples (no ORM objects, identity map or
+attribute instrumentation) and dumped with orjson, skipping response_model
+validation. That is safe because the data comes from our own database and
+the columns are taken from the response schema, so the JSON has the same
+shape as before and can't pick up extra fields like passwords.
+"""
+from typing import Iterable, List, Optional, Sequence, Type
+
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+class FastJSONResponse(ORJSONResponse):
+    """ORJSONResponse with UTC datetimes written as "...Z", the way pydantic writes them"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def select_fields(schema: Type[BaseModel], fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Field names from a fields= query value ("id,command,exit_status"), in
+    schema order; None (every field) when it's empty. Unknown names are a 400.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return [name for name in schema.model_fields if name in requested] or None
+
+
+def schema_columns(model, schema: Type[BaseModel], fields: Optional[Sequence[str]] = None) -> List:
+    """model's column attributes for every field of schema (or just fields), in field order"""
+    return [getattr(model, name) for name in schema.model_fields if fields is None or name in fields]
+
+
+def rows_response(rows: Iterable) -> FastJSONResponse:
+    """JSON array of objects from rows of a query over schema_columns(...)"""
+    return FastJSONResponse([row._asdict() for row in rows])
@@ -1,12 +1,37 @@
+from bootstrap import timed_import, startup_phase, mark_ready, startup_report
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from compression import CompressionMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import logging
 from config import settings
-from database import init_db
-from routers import auth, profile, servers, commands
-import os
+from database import init_db, engine
+from activity_feed import activity_feed
+from admission import admission
+from drain import drain
+from photo_service import UploadSizeLimitMiddleware
+from metrics import MetricsMiddleware, render_metrics
+from output_blobs import output_blob_collector
+from facts import facts_collector
+from profiling import ProfilingMiddleware
+from scheduler import scheduler
+from shell_sessions import shell_sessions
+from ssh_service import bastion_pool
+
+# Routers are imported one by one so the startup report shows each module's cost
+auth = timed_import("routers.auth")
+profile = timed_import("routers.profile")
+servers = timed_import("routers.servers")
+commands = timed_import("routers.commands")
+uploads = timed_import("routers.uploads")
+files = timed_import("routers.files")
+schedules = timed_import("routers.schedules")
+sessions = timed_import("routers.sessions")
+admin = timed_import("routers.admin")
+analytics = timed_import("routers.analytics")
+activity = timed_import("routers.activity")
+facts = timed_import("routers.facts")
 
 # Configure logging
 logging.basicConfig(
@@ -31,27 +56,75 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+# Leave headroom over MAX_FILE_SIZE for multipart boundaries and the text form fields
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path_prefix="/api/profile",
+    max_body_size=settings.MAX_FILE_SIZE + 65536,
+)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+# Added last so it wraps everything and also times rejected requests
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(auth.router)
 app.include_router(profile.router)
 app.include_router(servers.router)
 app.include_router(commands.router)
-
-
-if os.path.exists(settings.UPLOAD_DIR):
-    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+app.include_router(uploads.router)
+app.include_router(files.router)
+app.include_router(schedules.router)
+app.include_router(sessions.router)
+app.include_router(admin.router)
+app.include_router(analytics.router)
+app.include_router(activity.router)
+app.include_router(facts.router)
 
 
 @app.on_event("startup")
 async def startup_event():
     try:
         logger.info("Initializing database...")
-        init_db()
+        with startup_phase("init_db"):
+            init_db()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
         logger.warning("Application will continue, but database operations may fail")
+    admission.size_threadpool()
+    if settings.SCHEDULER_ENABLED:
+        scheduler.start()
+    shell_sessions.start()
+    bastion_pool.start()
+    output_blob_collector.start()
+    if settings.FACTS_REFRESH_INTERVAL > 0:
+        facts_collector.start()
+    activity_feed.start()
+    drain.reset()
+    # Open shells and activity feeds would hold their connections (and so the drain) open until the deadline
+    drain.on_begin(lambda: asyncio.create_task(shell_sessions.stop()))
+    drain.on_begin(lambda: activity_feed.close_all("draining"))
+    mark_ready()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # serve.py starts the drain when the signal arrives; under plain uvicorn it starts here
+    await drain.wait()
+    await scheduler.stop()
+    await shell_sessions.stop()
+    await bastion_pool.stop()
+    await output_blob_collector.stop()
+    await facts_collector.stop()
+    engine.dispose()
+    logger.info("Shutdown complete")
 
 
 @app.get("/")
@@ -66,9 +139,21 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    if drain.draining:
+        return JSONResponse(status_code=503, content={"status": "draining"})
     return {"status": "healthy"}
 
 
+@app.get("/health/startup")
+async def startup_health():
+    return startup_report()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
@@ -78,6 +163,7 @@ async def global_exception_handler(request, exc):
     )
 
 
+# Development server; production runs serve.py
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,267 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond DB hits to long SSH commands
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Registry:
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = _Registry()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def samples(self) -> Iterable[str]:
+        return []
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Gauge that is either set directly or computed at scrape time by a callback"""
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def samples(self) -> Iterable[str]:
+        if self._callback is not None:
+            try:
+                items = list(self._callback())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts (last slot is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, list(state[0]), state[1]) for labels, state in self._values.items()]
+        for labelvalues, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+)
+
+# SSH
+SSH_PHASE_DURATION = Histogram(
+    "ssh_phase_duration_seconds",
+    "SSHService.execute_command phase latency (connect: TCP, auth: SSH handshake and authentication, exec, read)",
+    ("phase",)
+)
+SSH_COMMANDS = Counter("ssh_commands_total", "Executed SSH commands by outcome", ("outcome",))
+SSH_FAILURES = Counter("ssh_failures_total", "Failed SSH executions by exception class", ("exception",))
+SSH_BASTION_CONNECTS = Counter("ssh_bastion_connects_total", "Connections opened to jump hosts")
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds", "Time spent queued for an SSH execution slot by lane", ("lane",)
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests refused by the admission layer by lane and reason", ("lane", "reason")
+)
+SCHEDULED_RUNS = Counter(
+    "scheduled_runs_total", "Scheduled command runs by outcome (success, failed, error, rejected, skipped_overlap)", ("outcome",)
+)
+SCHEDULER_LAG = Histogram(
+    "scheduler_lag_seconds",
+    "Delay between a schedule's due time and its command starting, jitter included",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+COMMAND_CACHE_REQUESTS = Counter(
+    "command_cache_requests_total", "Cacheable command executions by result (hit, miss, coalesced)", ("result",)
+)
+SHELL_BYTES = Counter("shell_bytes_total", "Interactive shell traffic by direction (input, output)", ("direction",))
+SFTP_BYTES = Counter("sftp_bytes_total", "Bytes moved over SFTP by direction", ("direction",))
+SFTP_TRANSFERS = Counter("sftp_transfers_total", "SFTP transfers by direction and status", ("direction", "status"))
+FACTS_COLLECTIONS = Counter("facts_collections_total", "Server facts collections by outcome (success, failed)", ("outcome",))
+SFTP_SYNC_BYTES_SAVED = Counter("sftp_sync_bytes_saved_total", "Bytes directory syncs didn't send because they were already on the remote")
+ACTIVITY_FEED_DISCONNECTS = Counter(
+    "activity_feed_disconnects_total", "Activity feeds ended by the server, by reason (slow_consumer, draining)", ("reason",)
+)
+
+# Database
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement latency by statement type", ("statement",))
+
+# Email
+EMAIL_SEND_DURATION = Histogram("email_send_duration_seconds", "Email send latency by transport", ("transport",))
+EMAIL_SENT = Counter("emails_sent_total", "Email send attempts by transport and result", ("transport", "result"))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency and status counts"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_templates: Dict[object, str] = {}
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._route_templates.get(endpoint)
+        if template is None:
+            # Label by template ("/api/servers/{server_id}"), never by raw path, to bound cardinality
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            else:
+                template = getattr(endpoint, "__name__", "unknown")
+            self._route_templates[endpoint] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_template(scope)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status_code))
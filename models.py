@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import (
+    Column, Integer, String, DateTime, Text, ForeignKey, Boolean, BigInteger, Float, Table, UniqueConstraint, select
+)
+from sqlalchemy.orm import column_property, relationship
+from sqlalchemy.sql import func, false
 from database import Base
 import datetime
 
@@ -18,6 +20,8 @@ class User(Base):
     profile = relationship("Profile", back_populates="user", uselist=False, cascade="all, delete-orphan")
     servers = relationship("Server", back_populates="owner", cascade="all, delete-orphan")
     command_logs = relationship("CommandLog", back_populates="user", cascade="all, delete-orphan")
+    file_transfers = relationship("FileTransfer", back_populates="user", cascade="all, delete-orphan")
+    command_schedules = relationship("CommandSchedule", back_populates="user", cascade="all, delete-orphan")
 
 
 class Profile(Base):
@@ -47,10 +51,45 @@ class Server(Base):
     password = Column(String(255))  
     ssh_key = Column(Text)  
     description = Column(Text)
+    # Connection profile; unset fields fall back to the SSH_* settings
+    auth_method = Column(String(20))  # auto / password / publickey
+    kex_algorithms = Column(Text)  # comma-separated, most preferred first
+    ciphers = Column(Text)
+    host_key_algorithms = Column(Text)
+    connect_timeout = Column(Float)
+    banner_timeout = Column(Float)
+    auth_timeout = Column(Float)
+    host_key = Column(Text)  # "<key type> <base64>", recorded on first contact
+    # Bastion this server is reached through (one hop; the jump host connects directly)
+    jump_host_id = Column(Integer, ForeignKey("servers.id", ondelete="SET NULL"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     owner = relationship("User", back_populates="servers")
+    # Joined so the bastion is available after the row leaves its session (threadpool, scheduler)
+    jump_host = relationship("Server", remote_side=[id], lazy="joined", join_depth=1)
     command_logs = relationship("CommandLog", back_populates="server", cascade="all, delete-orphan")
+    file_transfers = relationship("FileTransfer", back_populates="server", cascade="all, delete-orphan")
+    command_rollups = relationship("CommandRollup", cascade="all, delete-orphan")
+    command_rollup_counts = relationship("CommandRollupCount", cascade="all, delete-orphan")
+    facts = relationship("ServerFacts", uselist=False, cascade="all, delete-orphan")
+
+
+class OutputBlob(Base):
+    """Command output or error text, stored once however many logs share it (see output_blobs)"""
+    __tablename__ = "output_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    content = Column(Text, nullable=False)
+    size = Column(BigInteger, nullable=False)  # UTF-8 bytes
+    # Naive UTC; bumped on every reuse so garbage collection leaves blobs a writer just picked up
+    last_used_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+def _blob_text(blob_id, inline):
+    """The referenced blob's text, or the inline column of rows written before blobs existed"""
+    return func.coalesce(select(OutputBlob.content).where(OutputBlob.id == blob_id).scalar_subquery(), inline)
 
 
 class CommandLog(Base):
@@ -60,10 +99,133 @@ class CommandLog(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     server_id = Column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False)
     command = Column(Text, nullable=False)
-    output = Column(Text)
-    error = Column(Text)
+    # Written through output_blobs.store(); output and error below read whichever is set
+    inline_output = Column("output", Text)
+    inline_error = Column("error", Text)
+    output_blob_id = Column(Integer, ForeignKey("output_blobs.id"), index=True)
+    error_blob_id = Column(Integer, ForeignKey("output_blobs.id"), index=True)
+    output = column_property(_blob_text(output_blob_id, inline_output))
+    error = column_property(_blob_text(error_blob_id, inline_error))
     exit_status = Column(Integer)
+    cached = Column(Boolean, nullable=False, default=False, server_default=false())
+    schedule_id = Column(Integer, ForeignKey("command_schedules.id", ondelete="SET NULL"), index=True)
+    # Timing breakdown in ms from SSHService.execute_command; empty for cached results
+    connect_ms = Column(Float)
+    auth_ms = Column(Float)
+    exec_ms = Column(Float)
+    first_byte_ms = Column(Float)
+    duration_ms = Column(Float)
+    bytes_read = Column(BigInteger)
     execution_time = Column(DateTime(timezone=True), server_default=func.now())
     user = relationship("User", back_populates="command_logs")
     server = relationship("Server", back_populates="command_logs")
 
+
+class ServerFacts(Base):
+    """Inventory gathered from one server (see facts); sizes in bytes, times naive UTC"""
+    __tablename__ = "server_facts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    server_id = Column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False, unique=True)
+    hostname = Column(String(255))
+    os_name = Column(String(100))
+    os_version = Column(String(50))
+    kernel = Column(String(100))
+    architecture = Column(String(50))
+    cpu_count = Column(Integer)
+    cpu_model = Column(String(255))
+    memory_total = Column(BigInteger)
+    memory_available = Column(BigInteger)
+    disk_total = Column(BigInteger)  # the root filesystem
+    disk_used = Column(BigInteger)
+    disk_available = Column(BigInteger)
+    uptime_seconds = Column(Float)
+    # Last successful collection, and last attempt (the refresh claim); error is the last attempt's
+    collected_at = Column(DateTime)
+    attempted_at = Column(DateTime, index=True)
+    error = Column(Text)
+
+
+class CommandRollup(Base):
+    """Executions on one server in one hour, incremented as command logs are written"""
+    __tablename__ = "command_rollups"
+    __table_args__ = (UniqueConstraint("server_id", "bucket_start"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    server_id = Column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False)
+    bucket_start = Column(DateTime, nullable=False, index=True)  # naive UTC, on the hour
+    executions = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    cached = Column(Integer, nullable=False, default=0)
+    # Only executions that actually ran over SSH have a duration
+    timed = Column(Integer, nullable=False, default=0)
+    duration_total_ms = Column(Float, nullable=False, default=0)
+    duration_max_ms = Column(Float, nullable=False, default=0)
+
+
+class CommandRollupCount(Base):
+    """Exit-status and duration-histogram counts for the same (server, hour) as a CommandRollup"""
+    __tablename__ = "command_rollup_counts"
+    __table_args__ = (UniqueConstraint("server_id", "bucket_start", "dimension", "value"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    server_id = Column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    dimension = Column(String(20), nullable=False)  # exit_status / duration_ms
+    value = Column(Integer, nullable=False)  # the exit status, or the histogram bucket's upper bound
+    count = Column(Integer, nullable=False, default=0)
+
+
+class FileTransfer(Base):
+    __tablename__ = "file_transfers"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    server_id = Column(Integer, ForeignKey("servers.id", ondelete="CASCADE"), nullable=False)
+    direction = Column(String(10), nullable=False)  # upload / download / sync
+    remote_path = Column(Text, nullable=False)
+    range_start = Column(BigInteger)
+    range_end = Column(BigInteger)
+    bytes_transferred = Column(BigInteger, default=0)
+    duration_ms = Column(Float)
+    status = Column(String(20), nullable=False)  # completed / failed / aborted
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    user = relationship("User", back_populates="file_transfers")
+    server = relationship("Server", back_populates="file_transfers")
+
+
+schedule_servers = Table(
+    "schedule_servers",
+    Base.metadata,
+    Column("schedule_id", Integer, ForeignKey("command_schedules.id", ondelete="CASCADE"), primary_key=True),
+    Column("server_id", Integer, ForeignKey("servers.id", ondelete="CASCADE"), primary_key=True),
+    # Naive UTC; set while a run of the schedule on the server is in progress, in any worker
+    Column("running_since", DateTime),
+)
+
+
+class CommandSchedule(Base):
+    __tablename__ = "command_schedules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(100), nullable=False)
+    command = Column(Text, nullable=False)
+    cron = Column(String(100), nullable=False)
+    jitter_seconds = Column(Integer, default=0)
+    enabled = Column(Boolean, default=True)
+    # Naive UTC; the scheduler claims a run by advancing this with a compare-and-set
+    next_run_at = Column(DateTime, index=True)
+    last_run_at = Column(DateTime)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    user = relationship("User", back_populates="command_schedules")
+    servers = relationship("Server", secondary=schedule_servers)
+    
+    @property
+    def server_ids(self):
+        return [server.id for server in self.servers]
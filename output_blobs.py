@@ -0,0 +1,110 @@
+"""
+Content-addressed storage for command output.
+
+Each distinct output or error text is stored once in output_blobs, keyed by
+its SHA-256, however many command logs share it; health checks repeat the
+same output thousands of times a day. Writers pass store(db, output, error)
+to CommandLog(...) instead of the text, and CommandLog.output / .error read
+it back, so nothing else changes. Only byte-identical text is shared.
+
+Blobs aren't reference counted: logs also go away through ON DELETE CASCADE
+(deleting a server or user), which no ORM hook sees. Instead the collector
+periodically deletes blobs that no log references. Every reuse bumps
+last_used_at and only blobs unused for OUTPUT_BLOB_GC_GRACE seconds are
+collected, so a blob is never removed under a transaction that has just
+picked it up and not committed its log yet.
+"""
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import CommandLog, OutputBlob
+
+logger = logging.getLogger(__name__)
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def intern(db: Session, content: Optional[str]) -> Optional[int]:
+    """Id of the blob holding content, added in db's transaction if it's new"""
+    if content is None:
+        return None
+    data = content.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    now = datetime.utcnow()
+    dialect_insert = _UPSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(OutputBlob).values(sha256=digest, content=content, size=len(data), last_used_at=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[OutputBlob.sha256], set_={"last_used_at": statement.excluded.last_used_at}
+        ).returning(OutputBlob.id)
+        return db.execute(statement).scalar_one()
+    # No native upsert: touch the existing blob, or insert it
+    blob_id = db.execute(
+        update(OutputBlob).where(OutputBlob.sha256 == digest).values(last_used_at=now).returning(OutputBlob.id)
+    ).scalar()
+    if blob_id is None:
+        blob_id = db.execute(
+            insert(OutputBlob).values(sha256=digest, content=content, size=len(data), last_used_at=now)
+            .returning(OutputBlob.id)
+        ).scalar_one()
+    return blob_id
+
+
+def store(db: Session, output: Optional[str], error: Optional[str]) -> Dict[str, Optional[int]]:
+    """CommandLog keyword arguments for output and error, e.g. CommandLog(..., **store(db, output, error))"""
+    return {"output_blob_id": intern(db, output), "error_blob_id": intern(db, error)}
+
+
+class OutputBlobCollector:
+    """Background deletion of blobs no command log references any more"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.OUTPUT_BLOB_GC_INTERVAL)
+            try:
+                await run_in_threadpool(self.collect)
+            except Exception as e:
+                logger.error(f"Output blob collection failed: {e}")
+
+    @staticmethod
+    def collect() -> int:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.OUTPUT_BLOB_GC_GRACE)
+        db = SessionLocal()
+        try:
+            deleted = db.query(OutputBlob).filter(
+                OutputBlob.last_used_at < cutoff,
+                ~exists().where(CommandLog.output_blob_id == OutputBlob.id),
+                ~exists().where(CommandLog.error_blob_id == OutputBlob.id)
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        if deleted:
+            logger.info(f"Collected {deleted} unreferenced output blob(s)")
+        return deleted
+
+
+output_blob_collector = OutputBlobCollector()
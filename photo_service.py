@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from bootstrap import lazy_import
+from config import settings
+from models import Profile
+
+aiofiles = lazy_import("aiofiles")
+Image = lazy_import("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+# Image headers (JPEG SOF, PNG IHDR, GIF screen descriptor) normally live in the
+# first few KB; EXIF blocks can push the JPEG frame header further out.
+HEADER_PROBE_LIMIT = 1024 * 1024
+
+# Stored photos are named after the SHA-256 of the uploaded bytes, so a name
+# always refers to the same content and can be cached forever.
+HASHED_NAME_RE = re.compile(r"^(?P<digest>[0-9a-f]{32})(?P<size>_\d+)?\.(?P<ext>[a-z0-9]+)$")
+
+_executor = ThreadPoolExecutor(max_workers=settings.PHOTO_WORKERS, thread_name_prefix="photo")
+_last_sweep = 0.0
+
+
+class PhotoService:
+    """Streaming upload and off-loop resizing of profile photos"""
+
+    @staticmethod
+    def variant_filenames(filename: str) -> List[str]:
+        """All files rendered for a stored photo, the primary filename first"""
+        root, ext = os.path.splitext(filename)
+        sizes = settings.photo_sizes_list
+        names = [filename, f"{root}.webp"]
+        for size in sizes[1:]:
+            names.append(f"{root}_{size}{ext}")
+            names.append(f"{root}_{size}.webp")
+        return names
+
+    @staticmethod
+    def _probe_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+        """Return (width, height) once enough of the file has arrived to parse the header"""
+        try:
+            with Image.open(BytesIO(header)) as img:
+                return img.size
+        except Image.DecompressionBombError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Image dimensions too large"
+            )
+        except Exception:
+            return None
+
+    @staticmethod
+    def _check_dimensions(size: Tuple[int, int]) -> None:
+        width, height = size
+        if (
+            width > settings.MAX_IMAGE_DIMENSION
+            or height > settings.MAX_IMAGE_DIMENSION
+            or width * height > settings.MAX_IMAGE_PIXELS
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Image dimensions too large ({width}x{height}). "
+                       f"Maximum: {settings.MAX_IMAGE_DIMENSION}px per side"
+            )
+
+    @staticmethod
+    async def receive_upload(file: UploadFile, dest_path: str) -> Tuple[Tuple[int, int], str]:
+        """
+        Stream an upload to dest_path in fixed-size chunks.
+
+        Aborts with 413 as soon as MAX_FILE_SIZE is passed and with 400 as soon
+        as the image header reports oversized dimensions.
+
+        Returns:
+            Tuple of ((width, height), sha256 hex digest of the upload)
+        """
+        received = 0
+        header = b""
+        dimensions = None
+        digest = hashlib.sha256()
+        async with aiofiles.open(dest_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > settings.MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE} bytes"
+                    )
+                if dimensions is None and len(header) < HEADER_PROBE_LIMIT:
+                    header += chunk
+                    dimensions = PhotoService._probe_dimensions(header)
+                    if dimensions:
+                        PhotoService._check_dimensions(dimensions)
+                        header = b""
+                digest.update(chunk)
+                await buffer.write(chunk)
+
+        if dimensions is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid image file"
+            )
+        return dimensions, digest.hexdigest()
+
+    @staticmethod
+    def _save_atomic(img: "Image.Image", target: str, **params) -> None:
+        # Write next to the target and rename, so a concurrent request never
+        # serves (or dedupes against) a half-written file.
+        tmp_target = f"{target}.{uuid.uuid4().hex}.part"
+        try:
+            fmt = params.pop("format", None) or Image.registered_extensions()[os.path.splitext(target)[1].lower()]
+            img.save(tmp_target, format=fmt, **params)
+            os.replace(tmp_target, target)
+        finally:
+            if os.path.exists(tmp_target):
+                os.remove(tmp_target)
+
+    @staticmethod
+    def render_variants(source_path: str, filename: str) -> None:
+        """Resize source_path into every configured size (original format and WebP). Runs in the worker pool."""
+        root, ext = os.path.splitext(filename)
+        sizes = settings.photo_sizes_list
+        with Image.open(source_path) as img:
+            # Let the JPEG decoder downscale by DCT while decoding instead of
+            # materialising the full-resolution bitmap first.
+            img.draft("RGB", (sizes[0], sizes[0]))
+            img.load()
+            for index, size in enumerate(sizes):
+                variant = img.copy()
+                variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+                suffix = "" if index == 0 else f"_{size}"
+
+                webp_mode = "RGBA" if "A" in variant.getbands() or "transparency" in variant.info else "RGB"
+                PhotoService._save_atomic(
+                    variant.convert(webp_mode),
+                    os.path.join(settings.UPLOAD_DIR, f"{root}{suffix}.webp"),
+                    format="WEBP",
+                    quality=80,
+                    method=4
+                )
+                if ext.lower() in (".jpg", ".jpeg") and variant.mode not in ("RGB", "L"):
+                    variant = variant.convert("RGB")
+                # The primary file goes last: its presence marks the set as complete.
+                PhotoService._save_atomic(variant, os.path.join(settings.UPLOAD_DIR, f"{root}{suffix}{ext}"))
+
+    @staticmethod
+    def _is_stored(filename: str) -> bool:
+        return all(
+            os.path.exists(os.path.join(settings.UPLOAD_DIR, name))
+            for name in PhotoService.variant_filenames(filename)
+        )
+
+    @staticmethod
+    async def save_profile_photo(file: UploadFile, file_ext: str) -> str:
+        """
+        Stream the upload to a temp file, then render all sizes in the worker pool.
+
+        Returns the content-addressed filename. Identical uploads map to the same
+        name and are only rendered once.
+        """
+        tmp_path = os.path.join(settings.UPLOAD_DIR, f".upload_{uuid.uuid4().hex}.part")
+        try:
+            _, digest = await PhotoService.receive_upload(file, tmp_path)
+            filename = f"{digest[:32]}.{file_ext}"
+            primary_path = os.path.join(settings.UPLOAD_DIR, filename)
+            if PhotoService._is_stored(filename):
+                # Refresh mtime so a concurrent garbage collection pass treats it as new
+                os.utime(primary_path)
+                return filename
+
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(_executor, PhotoService.render_variants, tmp_path, filename)
+            except Exception as e:
+                logger.warning(f"Failed to process profile photo {filename}: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid image file"
+                )
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return filename
+
+    @staticmethod
+    def delete_photo(filename: str) -> None:
+        for name in PhotoService.variant_filenames(filename):
+            path = os.path.join(settings.UPLOAD_DIR, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def collect_garbage(db: Session, filename: Optional[str]) -> bool:
+        """
+        Delete a photo and its variants once no profile references it.
+
+        Content-addressed files can be shared between profiles, so a replaced or
+        deleted photo is only removed when it is unreferenced and older than
+        PHOTO_GC_GRACE_SECONDS (an upload of the same image may not have been
+        committed yet). Call after the change that dropped the reference is committed.
+        """
+        global _last_sweep
+        if time.monotonic() - _last_sweep > settings.PHOTO_GC_SWEEP_INTERVAL:
+            _last_sweep = time.monotonic()
+            PhotoService.sweep_orphans(db)
+
+        if not filename:
+            return False
+        if db.query(Profile.id).filter(Profile.profile_photo == filename).first():
+            return False
+        primary_path = os.path.join(settings.UPLOAD_DIR, filename)
+        try:
+            age = time.time() - os.path.getmtime(primary_path)
+        except OSError:
+            age = None
+        if age is not None and age < settings.PHOTO_GC_GRACE_SECONDS:
+            logger.info(f"Keeping recently stored photo {filename} ({age:.0f}s old)")
+            return False
+        PhotoService.delete_photo(filename)
+        logger.info(f"Removed unreferenced photo {filename}")
+        return True
+
+    @staticmethod
+    def sweep_orphans(db: Session) -> int:
+        """Collect stored photos that were kept inside the grace period and are now unreferenced"""
+        stored = set()
+        for name in os.listdir(settings.UPLOAD_DIR):
+            match = HASHED_NAME_RE.match(name)
+            if match and not match.group("size") and match.group("ext") != "webp":
+                stored.add(name)
+        if not stored:
+            return 0
+        referenced = {
+            row[0] for row in db.query(Profile.profile_photo).filter(Profile.profile_photo.in_(stored))
+        }
+        removed = 0
+        for name in stored - referenced:
+            try:
+                age = time.time() - os.path.getmtime(os.path.join(settings.UPLOAD_DIR, name))
+            except OSError:
+                continue
+            if age >= settings.PHOTO_GC_GRACE_SECONDS:
+                PhotoService.delete_photo(name)
+                removed += 1
+        if removed:
+            logger.info(f"Swept {removed} orphaned photos")
+        return removed
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject request bodies larger than max_body_size on path_prefix.
+
+    Starlette spools multipart bodies before the endpoint runs, so the file-size
+    check in PhotoService alone would only fire after the whole upload landed on
+    disk. This cuts the connection off while the body is still arriving.
+    """
+
+    def __init__(self, app, path_prefix: str, max_body_size: int):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT")
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"File too large. Maximum size: {settings.MAX_FILE_SIZE} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": detail}
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=detail
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
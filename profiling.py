@@ -0,0 +1,151 @@
+import itertools
+import logging
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Deep ASGI/middleware stacks are truncated at the root end past this many frames
+_MAX_STACK_DEPTH = 64
+
+
+class _Sampler:
+    """
+    Background thread that snapshots every thread's stack at a fixed interval.
+
+    Samples are added to all in-flight profiles. Requests share the event loop
+    and threadpool, so a profile shows what the whole process was doing while
+    that request was running; concurrent slow requests will show each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[int, dict] = {}
+        self._ids = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> int:
+        with self._lock:
+            token = next(self._ids)
+            self._active[token] = {"ticks": 0, "stacks": Counter()}
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+            return token
+
+    def stop(self, token: int) -> dict:
+        with self._lock:
+            return self._active.pop(token, {"ticks": 0, "stacks": Counter()})
+
+    def _run(self) -> None:
+        interval = settings.PROFILE_SAMPLE_INTERVAL_MS / 1000
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                targets = list(self._active.values())
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stacks.append(_collapse(names.get(thread_id, str(thread_id)), frame))
+            with self._lock:
+                for samples in targets:
+                    samples["ticks"] += 1
+                    samples["stacks"].update(stacks)
+            time.sleep(interval)
+
+
+def _collapse(thread_name: str, frame) -> str:
+    """Render a stack in collapsed format (root;...;leaf) as used by flamegraph.pl and speedscope"""
+    parts: List[str] = []
+    while frame is not None and len(parts) < _MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+_sampler = _Sampler()
+_profiles: Deque[dict] = deque(maxlen=settings.PROFILE_HISTORY_SIZE)
+_profile_ids = itertools.count(1)
+
+
+def list_profiles() -> List[dict]:
+    return [
+        {key: value for key, value in profile.items() if key != "stacks"}
+        for profile in reversed(_profiles)
+    ]
+
+
+def get_profile(profile_id: int) -> Optional[dict]:
+    for profile in _profiles:
+        if profile["id"] == profile_id:
+            return profile
+    return None
+
+
+def render_collapsed(profile: dict) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Sample every request and keep the profile of those slower than
+    PROFILE_LATENCY_THRESHOLD_MS, or sent with the PROFILE_HEADER header set.
+    Only installed when PROFILING_ENABLED is on.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.PROFILE_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        forced = dict(scope["headers"]).get(self.header, b"").strip().lower() in (b"1", b"true", b"yes")
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        token = _sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = _sampler.stop(token)
+            duration_ms = (time.perf_counter() - start) * 1000
+            if forced or duration_ms >= settings.PROFILE_LATENCY_THRESHOLD_MS:
+                profile = {
+                    "id": next(_profile_ids),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 1),
+                    "started_at": started_at.isoformat(),
+                    "forced": forced,
+                    "sample_count": samples["ticks"],
+                    "stacks": samples["stacks"],
+                }
+                _profiles.append(profile)
+                logger.info(
+                    f"Captured profile {profile['id']} for {profile['method']} {profile['path']} "
+                    f"({profile['duration_ms']}ms, {profile['sample_count']} samples)"
+                )
@@ -0,0 +1,160 @@
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import orjson
+from database import SessionLocal
+from auth import authenticate_token
+from config import settings
+from activity_feed import FeedClosed, Subscription, activity_feed, replay
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/activity", tags=["Activity"])
+
+
+def _bearer_token(headers) -> Optional[str]:
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" else None
+
+
+def _replay(user_id: int, after_id: Optional[int]) -> Tuple[List[Dict], bool]:
+    if after_id is None:
+        return [], False
+    db = SessionLocal()
+    try:
+        return replay(db, user_id, after_id)
+    finally:
+        db.close()
+
+
+def _dumps(data: Dict) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_UTC_Z)
+
+
+async def _sse_events(request: Request, subscription: Subscription, backlog: List[Dict], truncated: bool):
+    try:
+        if truncated:
+            yield b"event: reset\ndata: {}\n\n"
+        # Events published while the backlog was read are in both; skip the repeats
+        last_id = backlog[-1]["id"] if backlog else 0
+        for event in backlog:
+            yield b"id: %d\nevent: command\ndata: %s\n\n" % (event["id"], _dumps(event))
+        while True:
+            try:
+                event = await subscription.next(settings.FEED_KEEPALIVE_INTERVAL)
+            except FeedClosed as e:
+                yield b"event: close\ndata: %s\n\n" % _dumps({"reason": str(e)})
+                return
+            if event is None:
+                if await request.is_disconnected():
+                    return
+                yield b": keepalive\n\n"
+                continue
+            if event["id"] <= last_id:
+                continue
+            yield b"id: %d\nevent: command\ndata: %s\n\n" % (event["id"], _dumps(event))
+    finally:
+        activity_feed.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def activity_stream(request: Request, token: Optional[str] = None, last_id: Optional[int] = None):
+    """
+    Server-sent events: one "command" event per command log the user's
+    commands write, with the log id as the event id.
+
+    EventSource can't set headers, so the bearer token may be given as
+    ?token=. On reconnect the Last-Event-ID header (or ?last_id=) replays
+    what was missed; a "reset" event means more was missed than can be
+    replayed and the client should reload the log list. A "close" event
+    means the server ended the stream (too slow a consumer, or a restart):
+    reconnect with the last id.
+    """
+    user = await run_in_threadpool(authenticate_token, token or _bearer_token(request.headers))
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    event_id = request.headers.get("last-event-id", "")
+    if last_id is None and event_id.isdigit():
+        last_id = int(event_id)
+    
+    # Subscribe before replaying so nothing committed in between is missed
+    subscription = activity_feed.subscribe(user.id)
+    if subscription is None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {settings.FEED_MAX_SUBSCRIBERS_PER_USER} activity feeds per user"
+        )
+    try:
+        backlog, truncated = await run_in_threadpool(_replay, user.id, last_id)
+    except Exception:
+        activity_feed.unsubscribe(subscription)
+        raise
+    return StreamingResponse(
+        _sse_events(request, subscription, backlog, truncated),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _send_events(websocket: WebSocket, subscription: Subscription, backlog: List[Dict], truncated: bool) -> str:
+    """Pump events to the socket; returns why the feed ended it"""
+    if truncated:
+        await websocket.send_text('{"type":"reset"}')
+    last_id = backlog[-1]["id"] if backlog else 0
+    for event in backlog:
+        await websocket.send_bytes(_dumps({"type": "command", **event}))
+    while True:
+        try:
+            event = await subscription.next(settings.FEED_KEEPALIVE_INTERVAL)
+        except FeedClosed as e:
+            return str(e)
+        if event is None:
+            await websocket.send_text('{"type":"ping"}')
+        elif event["id"] > last_id:
+            await websocket.send_bytes(_dumps({"type": "command", **event}))
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@router.websocket("/ws")
+async def activity_socket(websocket: WebSocket, token: Optional[str] = None, last_id: Optional[int] = None):
+    """
+    The activity feed over a WebSocket: {"type": "command", ...} per command
+    log, {"type": "ping"} every FEED_KEEPALIVE_INTERVAL seconds and
+    {"type": "reset"} as on the SSE stream. ?last_id= replays what was
+    missed. A close with code 1013 means reconnect with the last id.
+    """
+    user = await run_in_threadpool(authenticate_token, token or _bearer_token(websocket.headers))
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    subscription = activity_feed.subscribe(user.id)
+    if subscription is None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    try:
+        backlog, truncated = await run_in_threadpool(_replay, user.id, last_id)
+        await websocket.accept()
+        sender = asyncio.create_task(_send_events(websocket, subscription, backlog, truncated))
+        receiver = asyncio.create_task(_wait_disconnect(websocket))
+        done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if sender in done and not sender.exception():
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=sender.result())
+        elif sender in done and not isinstance(sender.exception(), WebSocketDisconnect):
+            logger.warning(f"Activity feed socket error for user {user.id}: {sender.exception()}")
+    finally:
+        activity_feed.unsubscribe(subscription)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from typing import List
+from models import User
+from auth import get_current_admin
+import profiling
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+
+@router.get("/profiles", response_model=List[dict])
+async def list_profiles(current_user: User = Depends(get_current_admin)):
+    return profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def download_profile(
+    profile_id: int,
+    current_user: User = Depends(get_current_admin)
+):
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return PlainTextResponse(
+        profiling.render_collapsed(profile),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.collapsed.txt"'}
+    )
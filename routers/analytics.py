@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timedelta
+from database import get_db
+from models import User, Server
+from schemas import ServerAnalytics
+from auth import get_current_user
+from config import settings
+import analytics
+
+router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+
+
+@router.get("/servers", response_model=List[ServerAnalytics])
+async def get_server_analytics(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    server_id: Optional[int] = None,
+    bucket: Optional[str] = Query(None, pattern="^(hour|day)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Execution counts, failure rate, exit statuses and duration percentiles
+    per server (last 7 days by default), optionally per hour or day. Read
+    from the hourly rollups, never from command_logs.
+    """
+    # Rollup buckets are naive UTC; aware query parameters are converted to match
+    until = analytics.naive_utc(until) if until else datetime.utcnow()
+    since = analytics.naive_utc(since) if since else until - timedelta(days=7)
+    if since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must be before until"
+        )
+    if until - since > timedelta(days=settings.ANALYTICS_MAX_RANGE_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range is limited to {settings.ANALYTICS_MAX_RANGE_DAYS} days"
+        )
+    
+    if server_id is not None:
+        server = db.query(Server).filter(
+            Server.id == server_id,
+            Server.user_id == current_user.id
+        ).first()
+        if not server:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Server not found"
+            )
+    
+    return analytics.server_analytics(db, current_user.id, since, until, server_id, bucket)
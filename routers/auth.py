@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -9,14 +9,24 @@ from schemas import UserCreate, UserResponse, Token
 from auth import get_password_hash, verify_password, create_access_token, get_current_user
 from config import settings
 from email_service import EmailService
+from drain import run_tracked
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 
+def _send_welcome_email(email: str, username: str) -> None:
+    try:
+        email_sent = EmailService.send_welcome_email(email, username)
+        if not email_sent:
+            logger.warning(f"Failed to send welcome email to {email}")
+    except Exception as e:
+        logger.error(f"Error sending welcome email to {email}: {str(e)}")
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     existing_user = db.query(User).filter(User.username == user_data.username).first()
     if existing_user:
         raise HTTPException(
@@ -44,12 +54,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     db.refresh(new_user)
     
 
-    try:
-        email_sent = EmailService.send_welcome_email(new_user.email, new_user.username)
-        if not email_sent:
-            logger.warning(f"Failed to send welcome email to {new_user.email}")
-    except Exception as e:
-        logger.error(f"Error sending welcome email to {new_user.email}: {str(e)}")
+    # Sent after the response goes out; a graceful shutdown waits for it
+    background_tasks.add_task(run_tracked, "email", _send_welcome_email, new_user.email, new_user.username)
     
     return new_user
 
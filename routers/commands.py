@@ -1,19 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
-import re
+import logging
+from dataclasses import asdict
 from database import get_db
 from models import User, Server, CommandLog
-from schemas import CommandExecute, CommandResponse, CommandLogResponse
+from schemas import (
+    CommandExecute, CommandResponse, CommandLogResponse, ScriptExecute, ScriptResponse, ScriptStepResponse
+)
 from auth import get_current_user
-from ssh_service import SSHService
+from ssh_service import ExecutionTimings, ScriptStep, SSHService
+from command_cache import command_cache
+from admission import admission, host_key
+from drain import drain, run_tracked
+from activity_feed import activity_feed
 from email_service import EmailService
+from fast_json import rows_response, schema_columns, select_fields
+from command_export import EXPORT_MEDIA_TYPES, iter_export
+import analytics
+import output_blobs
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/commands", tags=["Commands"])
+
+
+def _send_execution_email(**kwargs) -> None:
+    try:
+        EmailService.send_command_execution_email(**kwargs)
+    except Exception as e:
+        logger.warning(f"Failed to send command execution email to {kwargs.get('to_email')}: {e}")
+
+
 @router.post("/execute", response_model=CommandResponse)
 async def execute_command(
     command_data: CommandExecute,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -38,52 +63,142 @@ async def execute_command(
         )
     
 
-    ssh_key_normalized = None
-    if server.ssh_key:
-        ssh_key_normalized = server.ssh_key.replace('\\n', '\n')
-        ssh_key_normalized = re.sub(r'\\+n', '\n', ssh_key_normalized)
+    # Only filled when this request runs the command itself (not a cache hit or coalesced result)
+    timings = ExecutionTimings()
     
-
-    success, output, error, exit_status = SSHService.execute_command(
-        host=server.host,
-        port=server.port,
-        username=server.username,
-        command=command_data.command,
-        password=server.password,
-        ssh_key=ssh_key_normalized
-    )
+    def run():
+        return SSHService.execute_on_server(server, command_data.command, timings)
+    
+    cached_result = command_cache.lookup(server.id, command_data.command)
+    if cached_result is not None:
+        (success, output, error, exit_status), cached = cached_result, True
+    else:
+        drain.check()
+        async with drain.track("command"), admission.slot(current_user.id, host_key(server)):
+            # Blocking SSH (and waiting on a coalesced execution) happens off the event loop
+            (success, output, error, exit_status), cached = await run_in_threadpool(
+                command_cache.execute, server.id, command_data.command, run
+            )
     
 
     command_log = CommandLog(
         user_id=current_user.id,
         server_id=server.id,
         command=command_data.command,
-        output=output,
-        error=error,
-        exit_status=exit_status
+        exit_status=exit_status,
+        cached=cached,
+        **output_blobs.store(db, output, error),
+        **asdict(timings)
     )
     db.add(command_log)
+    analytics.record_execution(db, command_log)
     db.commit()
     db.refresh(command_log)
+    activity_feed.publish_logs(db, current_user.id, [command_log.id])
     
 
-    try:
-        EmailService.send_command_execution_email(
-            to_email=current_user.email,
-            server_name=server.name,
-            command=command_data.command,
-            success=success,
-            output=output,
-            error=error
-        )
-    except Exception as e:
-        pass
+    # Sent after the response goes out; a graceful shutdown waits for it
+    background_tasks.add_task(
+        run_tracked, "email", _send_execution_email,
+        to_email=current_user.email,
+        server_name=server.name,
+        command=command_data.command,
+        success=success,
+        output=output,
+        error=error
+    )
     
     return CommandResponse(
         success=success,
         output=output,
         error=error,
         exit_status=exit_status,
+        cached=cached,
+        execution_time=datetime.utcnow()
+    )
+
+
+@router.post("/script", response_model=ScriptResponse)
+async def execute_script(
+    script: ScriptExecute,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Run steps in order over one SSH connection. A failing step ends the
+    script unless its (or the script's) on_failure is "continue"; steps
+    after the end are reported as skipped. Every step that ran is logged,
+    all in one transaction.
+    """
+    server = db.query(Server).filter(
+        Server.id == script.server_id,
+        Server.user_id == current_user.id
+    ).first()
+    
+    if not server:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Server not found"
+        )
+    
+    if not server.password and not server.ssh_key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Server must have either password or SSH key configured"
+        )
+    
+    # Refuse the whole script up front rather than stop halfway through a procedure
+    for index, step in enumerate(script.steps):
+        if SSHService.is_command_dangerous(step.command):
+            logger.warning(f"Blocked script with dangerous step {index + 1}: {step.command}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Step {index + 1} blocked: Potentially dangerous command detected"
+            )
+    
+    steps = [
+        ScriptStep(step.command, step.timeout, (step.on_failure or script.on_failure) == "continue")
+        for step in script.steps
+    ]
+    drain.check()
+    async with drain.track("command"), admission.slot(current_user.id, host_key(server)):
+        results = await run_in_threadpool(SSHService.execute_script, server, steps)
+    
+    logs = [
+        CommandLog(
+            user_id=current_user.id,
+            server_id=server.id,
+            command=result.command,
+            exit_status=result.exit_status,
+            **output_blobs.store(db, result.output, result.error),
+            **asdict(result.timings)
+        )
+        for result in results
+    ]
+    db.add_all(logs)
+    db.flush()
+    for log in logs:
+        analytics.record_execution(db, log)
+    log_ids = [log.id for log in logs]
+    db.commit()
+    activity_feed.publish_logs(db, current_user.id, log_ids)
+    
+    responses = [
+        ScriptStepResponse(
+            command=result.command,
+            status="succeeded" if result.success else "failed",
+            output=result.output,
+            error=result.error,
+            exit_status=result.exit_status,
+            duration_ms=result.timings.duration_ms,
+            log_id=log_id
+        )
+        for result, log_id in zip(results, log_ids)
+    ]
+    responses += [ScriptStepResponse(command=step.command, status="skipped") for step in steps[len(results):]]
+    return ScriptResponse(
+        success=len(results) == len(steps) and all(result.success for result in results),
+        steps=responses,
         execution_time=datetime.utcnow()
     )
 
@@ -91,12 +206,17 @@ async def execute_command(
 @router.get("/logs", response_model=List[CommandLogResponse])
 async def get_command_logs(
     server_id: int = None,
+    min_duration: Optional[float] = Query(None, ge=0, description="Only runs that took at least this many ms"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,command,exit_status"),
     limit: int = 100,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
 
-    query = db.query(CommandLog).filter(CommandLog.user_id == current_user.id)
+    # Column tuples straight to orjson; pages of large outputs made validation and json.dumps the bottleneck.
+    # Only the requested fields are selected, so output text isn't even read unless asked for.
+    columns = schema_columns(CommandLog, CommandLogResponse, select_fields(CommandLogResponse, fields))
+    query = db.query(*columns).filter(CommandLog.user_id == current_user.id)
     
     if server_id:
         server = db.query(Server).filter(
@@ -109,8 +229,41 @@ async def get_command_logs(
                 detail="Server not found"
             )
         query = query.filter(CommandLog.server_id == server_id)
+    if min_duration is not None:
+        query = query.filter(CommandLog.duration_ms >= min_duration)
     logs = query.order_by(CommandLog.execution_time.desc()).limit(limit).all()
-    return logs
+    return rows_response(logs)
+
+
+# Declared before /logs/{log_id} so "export" isn't taken for a log id
+@router.get("/logs/export")
+async def export_command_logs(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    server_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream the full command history, oldest first, as NDJSON or CSV (optionally gzipped)"""
+    if server_id is not None:
+        server = db.query(Server).filter(
+            Server.id == server_id,
+            Server.user_id == current_user.id
+        ).first()
+        if not server:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Server not found"
+            )
+    
+    filename = f"command-history-{datetime.utcnow():%Y%m%d}.{export_format}{'.gz' if gzip else ''}"
+    return StreamingResponse(
+        iter_export(current_user.id, export_format, gzip, server_id, since, until),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @router.get("/logs/{log_id}", response_model=CommandLogResponse)
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timedelta
+from database import get_db
+from models import User, ServerFacts
+from schemas import ServerFactsResponse, FactsRefreshResponse
+from auth import get_current_user
+from config import settings
+from drain import drain
+from facts import facts_collector
+
+router = APIRouter(prefix="/api/facts", tags=["Facts"])
+
+
+@router.get("", response_model=List[ServerFactsResponse])
+async def get_facts(
+    server_id: Optional[int] = None,
+    os: Optional[str] = Query(None, description="Substring of the OS name, case-insensitive"),
+    os_version: Optional[str] = None,
+    kernel: Optional[str] = Query(None, description="Kernel release prefix, e.g. 5.15"),
+    architecture: Optional[str] = None,
+    min_cpu_count: Optional[int] = Query(None, ge=1),
+    min_memory_mb: Optional[int] = Query(None, ge=0),
+    max_disk_used_percent: Optional[float] = Query(None, ge=0, le=100),
+    stale: Optional[bool] = Query(None, description="Only facts older than FACTS_MAX_AGE (or never collected), or only fresh ones"),
+    failed: Optional[bool] = Query(None, description="Only servers whose last collection failed, or only those where it succeeded"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stored inventory for the user's servers; never contacts them (see POST /api/facts/refresh)"""
+    query = db.query(ServerFacts).filter(ServerFacts.user_id == current_user.id)
+    if server_id is not None:
+        query = query.filter(ServerFacts.server_id == server_id)
+    if os:
+        query = query.filter(ServerFacts.os_name.ilike(f"%{os}%"))
+    if os_version:
+        query = query.filter(ServerFacts.os_version == os_version)
+    if kernel:
+        query = query.filter(ServerFacts.kernel.startswith(kernel, autoescape=True))
+    if architecture:
+        query = query.filter(ServerFacts.architecture == architecture)
+    if min_cpu_count is not None:
+        query = query.filter(ServerFacts.cpu_count >= min_cpu_count)
+    if min_memory_mb is not None:
+        query = query.filter(ServerFacts.memory_total >= min_memory_mb * 1048576)
+    if max_disk_used_percent is not None:
+        query = query.filter(ServerFacts.disk_used * 100 <= ServerFacts.disk_total * max_disk_used_percent)
+    if stale is not None:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.FACTS_MAX_AGE)
+        is_stale = or_(ServerFacts.collected_at.is_(None), ServerFacts.collected_at < cutoff)
+        query = query.filter(is_stale if stale else ~is_stale)
+    if failed is not None:
+        query = query.filter(ServerFacts.error.isnot(None) if failed else ServerFacts.error.is_(None))
+    return query.order_by(ServerFacts.server_id).all()
+
+
+@router.post("/refresh", response_model=FactsRefreshResponse)
+async def refresh_facts(
+    server_id: Optional[List[int]] = Query(None, description="Limit to these servers"),
+    force: bool = Query(False, description="Collect even facts that aren't stale yet"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Collect facts now for the user's stale servers (or all of them, with
+    force), with one command per server, many servers at a time. Servers
+    whose facts are fresh, or that another refresh is already collecting,
+    are left out of the counts.
+    """
+    drain.check()
+    return await facts_collector.refresh(current_user.id, server_id, force)
@@ -0,0 +1,331 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import asyncio
+import errno
+import logging
+import mimetypes
+import posixpath
+import time
+from database import get_db, SessionLocal
+from models import User, Server, FileTransfer
+from schemas import DirectorySync, DirectorySyncResponse, FileTransferResponse
+from auth import get_current_user
+from config import settings
+from ssh_service import SSHService, paramiko
+from metrics import SFTP_BYTES, SFTP_TRANSFERS
+from routers.uploads import parse_byte_range
+from admission import admission, host_key
+from drain import drain
+from sftp_sync import resolve_source, sync_directory
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/servers", tags=["Files"])
+
+
+def _get_server(db: Session, server_id: int, user: User) -> Server:
+    server = db.query(Server).filter(
+        Server.id == server_id,
+        Server.user_id == user.id
+    ).first()
+    if not server:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Server not found"
+        )
+    if not server.password and not server.ssh_key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Server must have either password or SSH key configured"
+        )
+    return server
+
+
+def _transfer_error(e: Exception) -> HTTPException:
+    if isinstance(e, paramiko.AuthenticationException):
+        return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="SSH authentication failed: Invalid credentials")
+    if isinstance(e, IOError) and e.errno == errno.ENOENT:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Remote file not found")
+    if isinstance(e, IOError) and e.errno == errno.EACCES:
+        return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied on remote path")
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Configuration error: {str(e)}")
+    return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"SFTP error: {str(e)}")
+
+
+def _record_transfer(
+    user_id: int,
+    server_id: int,
+    direction: str,
+    remote_path: str,
+    bytes_transferred: int,
+    started: float,
+    transfer_status: str,
+    error: Optional[str] = None,
+    range_start: Optional[int] = None,
+    range_end: Optional[int] = None
+) -> FileTransfer:
+    SFTP_BYTES.inc(direction, amount=bytes_transferred)
+    SFTP_TRANSFERS.inc(direction, transfer_status)
+    # Own session: downloads finish after the request's session has been closed
+    db = SessionLocal()
+    try:
+        transfer = FileTransfer(
+            user_id=user_id,
+            server_id=server_id,
+            direction=direction,
+            remote_path=remote_path,
+            range_start=range_start,
+            range_end=range_end,
+            bytes_transferred=bytes_transferred,
+            duration_ms=(time.perf_counter() - started) * 1000,
+            status=transfer_status,
+            error=error
+        )
+        db.add(transfer)
+        db.commit()
+        db.refresh(transfer)
+        return transfer
+    finally:
+        db.close()
+
+
+def _open_sftp(server: Server):
+    client = SSHService.connect_to_server(server)
+    try:
+        return client, client.open_sftp()
+    except Exception:
+        client.close()
+        raise
+
+
+@router.put("/{server_id}/files", response_model=FileTransferResponse, status_code=status.HTTP_201_CREATED)
+async def upload_file(
+    server_id: int,
+    request: Request,
+    path: str = Query(..., min_length=1, description="Absolute remote file path"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream the raw request body into a remote file in SFTP_CHUNK_SIZE writes"""
+    server = _get_server(db, server_id, current_user)
+    drain.check()
+    async with drain.track("transfer"), admission.slot(current_user.id, host_key(server)):
+        return await _upload(server, current_user, path, request)
+
+
+async def _upload(server: Server, current_user: User, path: str, request: Request) -> FileTransfer:
+    started = time.perf_counter()
+    try:
+        client, sftp = await run_in_threadpool(_open_sftp, server)
+    except Exception as e:
+        raise _transfer_error(e)
+
+    written = 0
+    try:
+        remote_file = await run_in_threadpool(sftp.open, path, "wb", settings.SFTP_CHUNK_SIZE)
+        # Don't wait for each write's ack; errors surface on close
+        remote_file.set_pipelined(True)
+        buffer = bytearray()
+        async for data in request.stream():
+            buffer.extend(data)
+            while len(buffer) >= settings.SFTP_CHUNK_SIZE:
+                block = bytes(buffer[:settings.SFTP_CHUNK_SIZE])
+                del buffer[:settings.SFTP_CHUNK_SIZE]
+                await run_in_threadpool(remote_file.write, block)
+                written += len(block)
+        if buffer:
+            await run_in_threadpool(remote_file.write, bytes(buffer))
+            written += len(buffer)
+        await run_in_threadpool(remote_file.close)
+    except Exception as e:
+        logger.error(f"SFTP upload to {server.host}:{path} failed: {e}")
+        await run_in_threadpool(
+            _record_transfer, current_user.id, server.id, "upload", path, written, started, "failed", str(e)
+        )
+        raise _transfer_error(e)
+    finally:
+        await run_in_threadpool(client.close)
+
+    logger.info(f"Uploaded {written} bytes to {server.host}:{path}")
+    return await run_in_threadpool(
+        _record_transfer, current_user.id, server.id, "upload", path, written, started, "completed"
+    )
+
+
+def _iter_remote_file(client, remote_file, start: int, end: int, user_id: int, server_id: int, path: str,
+                      started: float, range_requested: bool, release):
+    """
+    Yield bytes start..end (inclusive) of an open SFTP file.
+
+    Reads go out as windows of SFTP_MAX_CONCURRENT_REQUESTS pipelined chunk
+    requests (readv), so throughput is not bound by one round trip per chunk
+    while memory stays bounded by one window even if the HTTP client is slow.
+    """
+    chunk_size = settings.SFTP_CHUNK_SIZE
+    window = settings.SFTP_MAX_CONCURRENT_REQUESTS
+    sent = 0
+    transfer_status, error = "completed", None
+    try:
+        offset = start
+        while offset <= end:
+            chunks = []
+            while offset <= end and len(chunks) < window:
+                length = min(chunk_size, end - offset + 1)
+                chunks.append((offset, length))
+                offset += length
+            for data in remote_file.readv(chunks):
+                sent += len(data)
+                yield data
+    except GeneratorExit:
+        transfer_status = "aborted"
+        raise
+    except Exception as e:
+        transfer_status, error = "failed", str(e)
+        logger.error(f"SFTP download of {path} failed after {sent} bytes: {e}")
+        raise
+    finally:
+        try:
+            remote_file.close()
+        finally:
+            client.close()
+            release()
+        _record_transfer(
+            user_id, server_id, "download", path, sent, started, transfer_status, error,
+            range_start=start if range_requested else None,
+            range_end=end if range_requested else None
+        )
+
+
+@router.get("/{server_id}/files")
+async def download_file(
+    server_id: int,
+    request: Request,
+    path: str = Query(..., min_length=1, description="Absolute remote file path"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream a remote file; supports single Range requests for partial downloads"""
+    server = _get_server(db, server_id, current_user)
+    started = time.perf_counter()
+
+    def open_remote():
+        client, sftp = _open_sftp(server)
+        try:
+            remote_file = sftp.open(path, "rb")
+            return client, remote_file, remote_file.stat().st_size
+        except Exception:
+            client.close()
+            raise
+
+    # Once started the stream is part of the request, which uvicorn drains on shutdown
+    drain.check()
+    # The slot is held until the response body has been streamed
+    ticket = await admission.acquire(current_user.id, host_key(server))
+    loop = asyncio.get_running_loop()
+    try:
+        client, remote_file, file_size = await run_in_threadpool(open_remote)
+    except Exception as e:
+        admission.release(ticket)
+        raise _transfer_error(e)
+
+    headers = {"Accept-Ranges": "bytes"}
+    status_code = status.HTTP_200_OK
+    start, end = 0, file_size - 1
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            byte_range = parse_byte_range(range_header, file_size)
+        except ValueError:
+            # Malformed and multi-range headers are ignored (RFC 9110): send the whole file
+            range_header = None
+    if range_header:
+        if byte_range is None or byte_range[0] > byte_range[1]:
+            await run_in_threadpool(client.close)
+            admission.release(ticket)
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{file_size}"}
+            )
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Disposition"] = f'attachment; filename="{posixpath.basename(path) or "download"}"'
+
+    return StreamingResponse(
+        _iter_remote_file(
+            client, remote_file, start, end, current_user.id, server.id, path, started,
+            status_code == status.HTTP_206_PARTIAL_CONTENT,
+            lambda: loop.call_soon_threadsafe(admission.release, ticket)
+        ),
+        status_code=status_code,
+        headers=headers,
+        media_type=mimetypes.guess_type(path)[0] or "application/octet-stream"
+    )
+
+
+@router.post("/{server_id}/sync", response_model=DirectorySyncResponse)
+async def sync_files(
+    server_id: int,
+    sync: DirectorySync,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Push a staged directory to the server, sending only changed files and blocks"""
+    server = _get_server(db, server_id, current_user)
+    try:
+        source_dir = resolve_source(current_user.id, sync.source)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sync source not found")
+
+    drain.check()
+    started = time.perf_counter()
+    async with drain.track("transfer"), admission.slot(current_user.id, host_key(server)):
+        try:
+            report = await run_in_threadpool(sync_directory, server, source_dir, sync.destination, sync.checksum)
+        except Exception as e:
+            logger.error(f"Sync of {sync.source} to {server.host}:{sync.destination} failed: {e}")
+            await run_in_threadpool(
+                _record_transfer, current_user.id, server.id, "sync", sync.destination, 0, started, "failed", str(e)
+            )
+            raise _transfer_error(e)
+
+    failed = report.count("failed")
+    transfer = await run_in_threadpool(
+        _record_transfer, current_user.id, server.id, "sync", sync.destination, report.bytes_sent, started,
+        "failed" if failed else "completed", f"{failed} file(s) failed" if failed else None
+    )
+    return {
+        "transfer_id": transfer.id,
+        "files_total": len(report.files),
+        "files_unchanged": report.count("unchanged"),
+        "files_created": report.count("created"),
+        "files_updated": report.count("updated"),
+        "files_failed": failed,
+        "bytes_total": report.bytes_total,
+        "bytes_sent": report.bytes_sent,
+        "bytes_saved": report.bytes_saved,
+        "duration_ms": report.duration_ms,
+        "files": [synced for synced in report.files if synced.action != "unchanged"],
+    }
+
+
+@router.get("/{server_id}/transfers", response_model=List[FileTransferResponse])
+async def get_transfers(
+    server_id: int,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    transfers = db.query(FileTransfer).filter(
+        FileTransfer.user_id == current_user.id,
+        FileTransfer.server_id == server_id
+    ).order_by(FileTransfer.created_at.desc()).limit(limit).all()
+    return transfers
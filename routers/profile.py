@@ -1,19 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import Optional
-import os
-import shutil
 from database import get_db
 from models import User, Profile
 from schemas import ProfileCreate, ProfileUpdate, ProfileResponse
 from auth import get_current_user
 from config import settings
-from PIL import Image
+from photo_service import PhotoService
 
 router = APIRouter(prefix="/api/profile", tags=["Profile"])
 
 
-def save_profile_photo(file: UploadFile, user_id: int) -> str:
+async def save_profile_photo(file: UploadFile, user_id: int) -> str:
     file_ext = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
     allowed_exts = settings.allowed_extensions_list
     if file_ext not in allowed_exts:
@@ -23,20 +21,7 @@ def save_profile_photo(file: UploadFile, user_id: int) -> str:
         )
     
 
-    filename = f"profile_{user_id}_{file.filename}"
-    filepath = os.path.join(settings.UPLOAD_DIR, filename)
-    
-
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    try:
-        img = Image.open(filepath)
-        img.thumbnail((500, 500), Image.Resampling.LANCZOS)
-        img.save(filepath)
-    except Exception:
-        pass  
-    return filename
+    return await PhotoService.save_profile_photo(file, file_ext)
 
 
 @router.post("", response_model=ProfileResponse, status_code=status.HTTP_201_CREATED)
@@ -59,7 +44,7 @@ async def create_profile(
     
     photo_filename = None
     if profile_photo:
-        photo_filename = save_profile_photo(profile_photo, current_user.id)
+        photo_filename = await save_profile_photo(profile_photo, current_user.id)
     
     new_profile = Profile(
         user_id=current_user.id,
@@ -119,15 +104,14 @@ async def update_profile(
     
 
     if profile_photo:
-        if profile.profile_photo:
-            old_photo_path = os.path.join(settings.UPLOAD_DIR, profile.profile_photo)
-            if os.path.exists(old_photo_path):
-                os.remove(old_photo_path)
-        
-        profile.profile_photo = save_profile_photo(profile_photo, current_user.id)
+        old_photo = profile.profile_photo
+        profile.profile_photo = await save_profile_photo(profile_photo, current_user.id)
     
     db.commit()
     db.refresh(profile)
+    
+    if profile_photo and old_photo != profile.profile_photo:
+        PhotoService.collect_garbage(db, old_photo)
     return profile
 
 
@@ -145,13 +129,10 @@ async def delete_profile(
         )
     
 
-    if profile.profile_photo:
-        photo_path = os.path.join(settings.UPLOAD_DIR, profile.profile_photo)
-        if os.path.exists(photo_path):
-            os.remove(photo_path)
-    
+    old_photo = profile.profile_photo
     db.delete(profile)
     db.commit()
     
+    PhotoService.collect_garbage(db, old_photo)
     return None
 
@@ -0,0 +1,152 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime
+from database import get_db
+from models import User, Server, CommandSchedule
+from schemas import ScheduleCreate, ScheduleUpdate, ScheduleResponse
+from auth import get_current_user
+from config import settings
+from cron import CronExpression
+from ssh_service import SSHService
+
+router = APIRouter(prefix="/api/schedules", tags=["Schedules"])
+
+
+def _next_run(cron: str) -> datetime:
+    try:
+        return CronExpression(cron).next_after(datetime.utcnow())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cron expression: {str(e)}"
+        )
+
+
+def _validate_command(command: str) -> None:
+    if SSHService.is_command_dangerous(command):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Command blocked: Potentially dangerous command detected"
+        )
+
+
+def _validate_jitter(jitter_seconds: int) -> None:
+    if jitter_seconds > settings.SCHEDULER_MAX_JITTER_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"jitter_seconds must be at most {settings.SCHEDULER_MAX_JITTER_SECONDS}"
+        )
+
+
+def _get_servers(db: Session, server_ids: List[int], user: User) -> List[Server]:
+    servers = db.query(Server).filter(
+        Server.id.in_(server_ids),
+        Server.user_id == user.id
+    ).all()
+    if len(servers) != len(set(server_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Server not found"
+        )
+    return servers
+
+
+def _get_schedule(db: Session, schedule_id: int, user: User) -> CommandSchedule:
+    schedule = db.query(CommandSchedule).filter(
+        CommandSchedule.id == schedule_id,
+        CommandSchedule.user_id == user.id
+    ).first()
+    if not schedule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schedule not found"
+        )
+    return schedule
+
+
+@router.post("", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
+async def create_schedule(
+    schedule_data: ScheduleCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _validate_command(schedule_data.command)
+    _validate_jitter(schedule_data.jitter_seconds)
+    next_run_at = _next_run(schedule_data.cron)
+
+    new_schedule = CommandSchedule(
+        user_id=current_user.id,
+        name=schedule_data.name,
+        command=schedule_data.command,
+        cron=schedule_data.cron.strip(),
+        jitter_seconds=schedule_data.jitter_seconds,
+        enabled=schedule_data.enabled,
+        next_run_at=next_run_at,
+        servers=_get_servers(db, schedule_data.server_ids, current_user)
+    )
+    db.add(new_schedule)
+    db.commit()
+    db.refresh(new_schedule)
+    return new_schedule
+
+
+@router.get("", response_model=List[ScheduleResponse])
+async def get_schedules(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    schedules = db.query(CommandSchedule).filter(CommandSchedule.user_id == current_user.id).all()
+    return schedules
+
+
+@router.get("/{schedule_id}", response_model=ScheduleResponse)
+async def get_schedule(
+    schedule_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return _get_schedule(db, schedule_id, current_user)
+
+
+@router.put("/{schedule_id}", response_model=ScheduleResponse)
+async def update_schedule(
+    schedule_id: int,
+    schedule_data: ScheduleUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    schedule = _get_schedule(db, schedule_id, current_user)
+    update_data = schedule_data.model_dump(exclude_unset=True)
+
+    if update_data.get("command") is not None:
+        _validate_command(update_data["command"])
+    if update_data.get("jitter_seconds") is not None:
+        _validate_jitter(update_data["jitter_seconds"])
+    if update_data.get("server_ids") is not None:
+        schedule.servers = _get_servers(db, update_data.pop("server_ids"), current_user)
+
+    for field, value in update_data.items():
+        if value is not None:
+            setattr(schedule, field, value)
+
+    # Re-arm from now when the timing changes or a disabled schedule is turned back on
+    if "cron" in update_data or update_data.get("enabled"):
+        schedule.cron = schedule.cron.strip()
+        schedule.next_run_at = _next_run(schedule.cron)
+
+    db.commit()
+    db.refresh(schedule)
+    return schedule
+
+
+@router.delete("/{schedule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_schedule(
+    schedule_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    schedule = _get_schedule(db, schedule_id, current_user)
+    db.delete(schedule)
+    db.commit()
+    return None
@@ -1,13 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
-from models import User, Server
+from models import User, Server, ServerFacts
 from schemas import ServerCreate, ServerUpdate, ServerResponse
 from auth import get_current_user
+from command_cache import command_cache
+from ssh_service import ConnectionProfile, bastion_pool
+from fast_json import rows_response, schema_columns, select_fields
 
 router = APIRouter(prefix="/api/servers", tags=["Servers"])
 
+PROFILE_FIELDS = (
+    'auth_method', 'kex_algorithms', 'ciphers', 'host_key_algorithms',
+    'connect_timeout', 'banner_timeout', 'auth_timeout'
+)
+
+
+def _validate_profile(server: Server) -> None:
+    try:
+        ConnectionProfile.from_server(server).validate()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def _validate_jump_host(db: Session, server: Server) -> None:
+    """One hop only: the jump host must connect directly and this server must not be anyone's jump host"""
+    if server.jump_host_id is None:
+        return
+    if server.jump_host_id == server.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A server cannot be its own jump host"
+        )
+    jump_host = db.query(Server).filter(
+        Server.id == server.jump_host_id,
+        Server.user_id == server.user_id
+    ).first()
+    if not jump_host:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Jump host not found"
+        )
+    if jump_host.jump_host_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Jump host must be reachable directly (it has a jump host of its own)"
+        )
+    if server.id is not None and db.query(Server.id).filter(Server.jump_host_id == server.id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This server is a jump host for other servers and must be reachable directly"
+        )
+
 
 @router.post("", response_model=ServerResponse, status_code=status.HTTP_201_CREATED)
 async def create_server(
@@ -28,8 +76,12 @@ async def create_server(
         username=server_data.username,
         password=server_data.password if server_data.password else None,
         ssh_key=ssh_key_normalized,
-        description=server_data.description
+        description=server_data.description,
+        jump_host_id=server_data.jump_host_id,
+        **{field: getattr(server_data, field) or None for field in PROFILE_FIELDS}
     )
+    _validate_jump_host(db, new_server)
+    _validate_profile(new_server)
     db.add(new_server)
     db.commit()
     db.refresh(new_server) 
@@ -38,11 +90,13 @@ async def create_server(
 
 @router.get("", response_model=List[ServerResponse])
 async def get_servers(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,host"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    servers = db.query(Server).filter(Server.user_id == current_user.id).all()
-    return servers
+    columns = schema_columns(Server, ServerResponse, select_fields(ServerResponse, fields))
+    servers = db.query(*columns).filter(Server.user_id == current_user.id).all()
+    return rows_response(servers)
 
 
 @router.get("/{server_id}", response_model=ServerResponse)
@@ -95,15 +149,31 @@ async def update_server(
         if 'password' not in update_data:
             update_data['password'] = None
     
+    # A different endpoint means a different host key, and maybe a different machine
+    endpoint_changed = any(
+        field in update_data and update_data[field] != getattr(server, field) for field in ('host', 'port')
+    )
+    if endpoint_changed:
+        update_data.setdefault('host_key', None)
+    
     for field, value in update_data.items():
-        if field in ['password', 'ssh_key', 'description'] and value == "":
+        if field in ['password', 'ssh_key', 'description', 'host_key', *PROFILE_FIELDS] and value == "":
             value = None
         if field == 'ssh_key' and value:
             value = value.replace('\\n', '\n')
         setattr(server, field, value)
+    _validate_jump_host(db, server)
+    _validate_profile(server)
+    if endpoint_changed:
+        # Due for collection on the next refresh; the old facts stay until then
+        db.query(ServerFacts).filter(ServerFacts.server_id == server.id).update(
+            {"attempted_at": None}, synchronize_session=False
+        )
     
     db.commit()
     db.refresh(server)
+    command_cache.invalidate_server(server.id)
+    bastion_pool.discard(server.id)
     
     return server
 
@@ -126,8 +196,17 @@ async def delete_server(
             detail="Server not found"
         )
     
+    dependents = db.query(Server).filter(Server.jump_host_id == server_id).count()
+    if dependents:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Server is the jump host for {dependents} other server(s); reassign them first"
+        )
+    
     db.delete(server)
     db.commit()
+    command_cache.invalidate_server(server_id)
+    bastion_pool.discard(server_id)
     
     return None
 
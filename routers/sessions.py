@@ -0,0 +1,163 @@
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import asyncio
+import json
+import logging
+from database import get_db
+from models import User, Server
+from schemas import ShellSessionCreate, ShellSessionResponse
+from auth import authenticate_token, get_current_user
+from shell_sessions import ShellSession, shell_sessions
+from drain import drain
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/sessions", tags=["Sessions"])
+
+
+def _to_response(session: ShellSession) -> ShellSessionResponse:
+    return ShellSessionResponse(
+        id=session.id,
+        server_id=session.server_id,
+        server_name=session.server_name,
+        created_at=session.created_at,
+        idle_seconds=round(session.idle_seconds, 1),
+        attached=session.attached,
+        transcript=session.transcript is not None,
+        websocket_path=f"{router.prefix}/{session.id}/ws"
+    )
+
+
+@router.post("", response_model=ShellSessionResponse, status_code=status.HTTP_201_CREATED)
+async def open_session(
+    session_data: ShellSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    server = db.query(Server).filter(
+        Server.id == session_data.server_id,
+        Server.user_id == current_user.id
+    ).first()
+    if not server:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Server not found"
+        )
+    if not server.password and not server.ssh_key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Server must have either password or SSH key configured"
+        )
+
+    drain.check()
+    try:
+        session = await shell_sessions.open(
+            current_user.id, server, session_data.cols, session_data.rows, session_data.transcript
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to open shell on {server.host}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Could not open shell: {str(e)}"
+        )
+    return _to_response(session)
+
+
+@router.get("", response_model=List[ShellSessionResponse])
+async def list_sessions(current_user: User = Depends(get_current_user)):
+    return [_to_response(session) for session in shell_sessions.list_for_user(current_user.id)]
+
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def close_session(session_id: str, current_user: User = Depends(get_current_user)):
+    if not shell_sessions.get(session_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    await shell_sessions.close(session_id, "closed by user")
+    return None
+
+
+async def _pump_output(websocket: WebSocket, session: ShellSession) -> None:
+    while True:
+        data = await session.output.get()
+        if data is None:
+            await websocket.send_text(json.dumps({"type": "exit", "exit_status": session.exit_status}))
+            return
+        await websocket.send_bytes(data)
+
+
+async def _pump_input(websocket: WebSocket, session: ShellSession) -> None:
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("bytes") is not None:
+            await session.send(message["bytes"])
+            continue
+        try:
+            control = json.loads(message.get("text") or "")
+        except ValueError:
+            continue
+        if control.get("type") == "input":
+            await session.send(str(control.get("data", "")).encode("utf-8"))
+        elif control.get("type") == "resize":
+            await session.resize(int(control["cols"]), int(control["rows"]))
+        elif control.get("type") == "ping":
+            session.touch()
+            await websocket.send_text(json.dumps({"type": "pong"}))
+
+
+@router.websocket("/{session_id}/ws")
+async def session_socket(websocket: WebSocket, session_id: str, token: Optional[str] = None):
+    """
+    Attach to a shell session.
+
+    Browsers can't set headers on WebSockets, so the bearer token may be given
+    as ?token=. Binary frames are keystrokes; text frames are JSON control
+    messages ({"type": "input" | "resize" | "ping", ...}). Output arrives as
+    binary frames, followed by {"type": "exit", "exit_status": ...} when the
+    shell ends. Disconnecting detaches; the session stays open until it is
+    deleted, the shell exits or SHELL_IDLE_TIMEOUT passes.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    user = await run_in_threadpool(authenticate_token, token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    session = shell_sessions.get(session_id, user.id)
+    if session is None or session.attached:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    session.attached = True
+    session.touch()
+    tasks = [
+        asyncio.create_task(_pump_output(websocket, session)),
+        asyncio.create_task(_pump_input(websocket, session)),
+    ]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.warning(f"Shell session {session_id} socket error: {task.exception()}")
+    finally:
+        session.attached = False
+
+    if session.finished.is_set() or session.closed:
+        await shell_sessions.close(session_id, "shell exited")
+        try:
+            await websocket.close()
+        except RuntimeError:
+            pass
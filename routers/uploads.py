@@ -0,0 +1,112 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Optional, Tuple
+import mimetypes
+import os
+from bootstrap import lazy_import
+from config import settings
+from photo_service import HASHED_NAME_RE
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+aiofiles = lazy_import("aiofiles")
+
+mimetypes.add_type("image/webp", ".webp")
+
+STREAM_CHUNK_SIZE = 65536
+
+
+def _is_digits(text: str) -> bool:
+    return text.isascii() and text.isdigit()
+
+
+def parse_byte_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=start-end" range. Returns inclusive (start, end) or None if unsatisfiable."""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError("Only single byte ranges are supported")
+    start_text, _, end_text = spec.strip().partition("-")
+    # Plain digits only: int() would also take signs, whitespace and underscores
+    if not start_text:
+        if not _is_digits(end_text):
+            raise ValueError("Malformed suffix byte range")
+        length = int(end_text)
+        if length == 0 or file_size == 0:
+            return None
+        return max(file_size - length, 0), file_size - 1
+    if not _is_digits(start_text) or (end_text and not _is_digits(end_text)):
+        raise ValueError("Malformed byte range")
+    start = int(start_text)
+    end = int(end_text) if end_text else file_size - 1
+    if start >= file_size or end < start:
+        return None
+    return start, min(end, file_size - 1)
+
+
+async def _iter_file_range(path: str, start: int, end: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_upload(filename: str, request: Request):
+    if filename.startswith(".") or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    path = os.path.join(settings.UPLOAD_DIR, filename)
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    match = HASHED_NAME_RE.match(filename)
+    if match:
+        # Content-addressed: the name pins the bytes, so the ETag is strong and never changes
+        etag = f'"{os.path.splitext(filename)[0]}"'
+        cache_control = f"public, max-age={settings.PHOTO_CACHE_MAX_AGE}, immutable"
+    else:
+        etag = f'W/"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+        cache_control = "no-cache"
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    file_size = stat_result.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_byte_range(range_header, file_size)
+        except ValueError:
+            # Malformed and multi-range headers are ignored (RFC 9110): serve the whole file
+            return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result, method=request.method)
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{file_size}"
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        headers["Content-Length"] = str(end - start + 1)
+        if request.method == "HEAD":
+            return Response(status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers, media_type=media_type)
+        return StreamingResponse(
+            _iter_file_range(path, start, end),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            headers=headers,
+            media_type=media_type
+        )
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result, method=request.method)
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import random
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
+
+import analytics
+import output_blobs
+from activity_feed import activity_feed
+from admission import BATCH, admission, host_key
+
+from config import settings
+from cron import CronExpression
+from database import SessionLocal
+from drain import drain
+from metrics import SCHEDULED_RUNS, SCHEDULER_LAG
+from models import CommandLog, CommandSchedule, Server, schedule_servers
+from ssh_service import ExecutionTimings, SSHService
+
+logger = logging.getLogger(__name__)
+
+
+def jitter_offset(schedule_id: int, server_id: int, jitter_seconds: int) -> float:
+    """
+    Stable delay for one (schedule, server) target within [0, jitter_seconds).
+
+    Seeding by the target instead of drawing fresh randomness keeps each
+    server's interval regular while spreading a schedule's servers apart.
+    """
+    if jitter_seconds <= 0:
+        return 0.0
+    return random.Random(f"{schedule_id}:{server_id}").uniform(0, jitter_seconds)
+
+
+def _mark_running(db, schedule_id: int, server_id: int, now: datetime) -> bool:
+    """Compare-and-set the target's running mark; False while another run (in any worker) holds it"""
+    expired = now - timedelta(seconds=settings.SCHEDULER_RUN_MARK_TIMEOUT)
+    result = db.execute(schedule_servers.update().where(
+        schedule_servers.c.schedule_id == schedule_id,
+        schedule_servers.c.server_id == server_id,
+        or_(schedule_servers.c.running_since.is_(None), schedule_servers.c.running_since < expired)
+    ).values(running_since=now))
+    return result.rowcount == 1
+
+
+class Scheduler:
+    """
+    Runs due CommandSchedules from inside the app process.
+
+    Every SCHEDULER_POLL_INTERVAL seconds due schedules are claimed by moving
+    next_run_at forward with a compare-and-set, so with several workers (or
+    instances) each occurrence runs once. Missed occurrences are not
+    backfilled. Each target server is delayed by its jitter offset, at most
+    SCHEDULER_MAX_CONCURRENCY commands run at a time (on top of the batch
+    lane admission limits), and a target whose previous run is still going is
+    skipped for that occurrence. Runs in progress are marked on their
+    schedule_servers row, claimed with a compare-and-set too, so the skip
+    holds across workers; a mark left by a worker that died expires after
+    SCHEDULER_RUN_MARK_TIMEOUT.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._runs: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._semaphore = asyncio.Semaphore(settings.SCHEDULER_MAX_CONCURRENCY)
+            self._task = asyncio.create_task(self._loop())
+            logger.info("Command scheduler started")
+
+    async def stop(self) -> None:
+        tasks = [task for task in [self._task, *self._runs] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._runs.clear()
+
+    async def _loop(self) -> None:
+        while True:
+            # A draining process leaves due schedules for the next one to claim
+            if drain.draining:
+                return
+            try:
+                for run in await run_in_threadpool(self.claim_due, datetime.utcnow()):
+                    self._dispatch(run)
+            except Exception as e:
+                logger.error(f"Scheduler poll failed: {e}")
+            await asyncio.sleep(settings.SCHEDULER_POLL_INTERVAL)
+
+    @staticmethod
+    def claim_due(now: datetime) -> List[Dict]:
+        """Advance every due schedule this process wins, mark its idle targets running and return them"""
+        db = SessionLocal()
+        runs = []
+        try:
+            due = db.query(CommandSchedule).filter(
+                CommandSchedule.enabled.is_(True),
+                CommandSchedule.next_run_at <= now
+            ).all()
+            for schedule in due:
+                run = {
+                    "schedule_id": schedule.id,
+                    "user_id": schedule.user_id,
+                    "command": schedule.command,
+                    "jitter_seconds": schedule.jitter_seconds or 0,
+                    "scheduled_for": schedule.next_run_at,
+                    "targets": [(server.id, host_key(server)) for server in schedule.servers],
+                }
+                try:
+                    next_run_at = CronExpression(schedule.cron).next_after(now)
+                except ValueError as e:
+                    logger.error(f"Disabling schedule {schedule.id}: {e}")
+                    next_run_at = None
+                claimed = db.query(CommandSchedule).filter(
+                    CommandSchedule.id == schedule.id,
+                    CommandSchedule.next_run_at == schedule.next_run_at
+                ).update(
+                    {"next_run_at": next_run_at, "last_run_at": now, "enabled": next_run_at is not None},
+                    synchronize_session=False
+                )
+                db.commit()
+                if not claimed:
+                    continue
+                targets = []
+                for server_id, host in run["targets"]:
+                    if _mark_running(db, schedule.id, server_id, now):
+                        targets.append((server_id, host))
+                    else:
+                        SCHEDULED_RUNS.inc("skipped_overlap")
+                        logger.warning(f"Schedule {schedule.id} still running on server {server_id}; skipping this run")
+                db.commit()
+                runs.append({**run, "targets": targets, "marked_at": now})
+        finally:
+            db.close()
+        return runs
+
+    def _dispatch(self, run: Dict) -> None:
+        for server_id, host in run["targets"]:
+            task = asyncio.create_task(self._run_target(run, server_id, host))
+            self._runs.add(task)
+            task.add_done_callback(self._runs.discard)
+
+    async def _run_target(self, run: Dict, server_id: int, host: str) -> None:
+        target = (run["schedule_id"], server_id)
+        try:
+            await asyncio.sleep(jitter_offset(run["schedule_id"], server_id, run["jitter_seconds"]))
+            drain.check()
+            async with self._semaphore, admission.slot(run["user_id"], host, BATCH), drain.track("scheduled"):
+                SCHEDULER_LAG.observe((datetime.utcnow() - run["scheduled_for"]).total_seconds())
+                await run_in_threadpool(self.execute, run, server_id)
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as e:
+            SCHEDULED_RUNS.inc("rejected")
+            logger.warning(f"Scheduled run of schedule {target[0]} on server {server_id} not admitted: {e.detail}")
+        except Exception as e:
+            SCHEDULED_RUNS.inc("error")
+            logger.error(f"Scheduled run of schedule {target[0]} on server {server_id} failed: {e}")
+        finally:
+            try:
+                await run_in_threadpool(self.clear_running, run, server_id)
+            except Exception as e:
+                logger.error(f"Clearing the running mark of schedule {target[0]} on server {server_id} failed: {e}")
+
+    @staticmethod
+    def clear_running(run: Dict, server_id: int) -> None:
+        """Drop the target's running mark, unless it expired and another run has set its own since"""
+        db = SessionLocal()
+        try:
+            db.execute(schedule_servers.update().where(
+                schedule_servers.c.schedule_id == run["schedule_id"],
+                schedule_servers.c.server_id == server_id,
+                schedule_servers.c.running_since == run["marked_at"]
+            ).values(running_since=None))
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def execute(run: Dict, server_id: int) -> None:
+        # Don't hold a pooled DB connection for the length of the SSH command
+        db = SessionLocal()
+        try:
+            server = db.query(Server).filter(
+                Server.id == server_id,
+                Server.user_id == run["user_id"]
+            ).first()
+            if server is None:
+                return
+            db.expunge(server)
+        finally:
+            db.close()
+
+        timings = ExecutionTimings()
+        success, output, error, exit_status = SSHService.execute_on_server(server, run["command"], timings)
+        SCHEDULED_RUNS.inc("success" if success else "failed")
+
+        db = SessionLocal()
+        try:
+            command_log = CommandLog(
+                user_id=run["user_id"],
+                server_id=server_id,
+                command=run["command"],
+                exit_status=exit_status,
+                schedule_id=run["schedule_id"],
+                **output_blobs.store(db, output, error),
+                **asdict(timings)
+            )
+            db.add(command_log)
+            analytics.record_execution(db, command_log)
+            db.flush()
+            log_id = command_log.id
+            db.commit()
+            activity_feed.publish_logs(db, run["user_id"], [log_id])
+        finally:
+            db.close()
+
+
+scheduler = Scheduler()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -72,6 +72,14 @@ class ServerCreate(BaseModel):
     password: Optional[str] = None
     ssh_key: Optional[str] = None
     description: Optional[str] = None
+    auth_method: Optional[str] = Field(None, pattern="^(auto|password|publickey)$")
+    kex_algorithms: Optional[str] = None
+    ciphers: Optional[str] = None
+    host_key_algorithms: Optional[str] = None
+    connect_timeout: Optional[float] = Field(None, gt=0, le=300)
+    banner_timeout: Optional[float] = Field(None, gt=0, le=300)
+    auth_timeout: Optional[float] = Field(None, gt=0, le=300)
+    jump_host_id: Optional[int] = None
 
 
 class ServerUpdate(BaseModel):
@@ -82,6 +90,17 @@ class ServerUpdate(BaseModel):
     password: Optional[str] = None
     ssh_key: Optional[str] = None
     description: Optional[str] = None
+    auth_method: Optional[str] = Field(None, pattern="^(auto|password|publickey)$")
+    kex_algorithms: Optional[str] = None
+    ciphers: Optional[str] = None
+    host_key_algorithms: Optional[str] = None
+    connect_timeout: Optional[float] = Field(None, gt=0, le=300)
+    banner_timeout: Optional[float] = Field(None, gt=0, le=300)
+    auth_timeout: Optional[float] = Field(None, gt=0, le=300)
+    # Send "" to forget the recorded host key (e.g. after the server was reinstalled)
+    host_key: Optional[str] = None
+    # Send null to connect directly again
+    jump_host_id: Optional[int] = None
 
 
 class ServerResponse(BaseModel):
@@ -92,6 +111,15 @@ class ServerResponse(BaseModel):
     port: int
     username: str
     description: Optional[str]
+    auth_method: Optional[str] = None
+    kex_algorithms: Optional[str] = None
+    ciphers: Optional[str] = None
+    host_key_algorithms: Optional[str] = None
+    connect_timeout: Optional[float] = None
+    banner_timeout: Optional[float] = None
+    auth_timeout: Optional[float] = None
+    host_key: Optional[str] = None
+    jump_host_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime]
     
@@ -110,6 +138,35 @@ class CommandResponse(BaseModel):
     output: Optional[str]
     error: Optional[str]
     exit_status: Optional[int]
+    cached: bool = False
+    execution_time: datetime
+
+
+class ScriptStepExecute(BaseModel):
+    command: str = Field(..., min_length=1)
+    timeout: float = Field(60, gt=0, le=3600)  # seconds for the whole step
+    on_failure: Optional[str] = Field(None, pattern="^(stop|continue)$")  # the script's policy when unset
+
+
+class ScriptExecute(BaseModel):
+    server_id: int
+    steps: List[ScriptStepExecute] = Field(..., min_length=1, max_length=50)
+    on_failure: str = Field("stop", pattern="^(stop|continue)$")
+
+
+class ScriptStepResponse(BaseModel):
+    command: str
+    status: str  # succeeded / failed / skipped
+    output: Optional[str] = None
+    error: Optional[str] = None
+    exit_status: Optional[int] = None
+    duration_ms: Optional[float] = None
+    log_id: Optional[int] = None
+
+
+class ScriptResponse(BaseModel):
+    success: bool  # every step ran and exited 0
+    steps: List[ScriptStepResponse]
     execution_time: datetime
 
 
@@ -121,8 +178,193 @@ class CommandLogResponse(BaseModel):
     output: Optional[str]
     error: Optional[str]
     exit_status: Optional[int]
+    cached: bool = False
+    schedule_id: Optional[int] = None
+    connect_ms: Optional[float] = None
+    auth_ms: Optional[float] = None
+    exec_ms: Optional[float] = None
+    first_byte_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+    bytes_read: Optional[int] = None
     execution_time: datetime
     
     class Config:
         from_attributes = True
 
+
+class ActivityEvent(BaseModel):
+    """One command log on the live activity feed; the full log (with output) is at /api/commands/logs/{id}"""
+    id: int
+    server_id: int
+    command: str
+    exit_status: Optional[int]
+    cached: bool = False
+    schedule_id: Optional[int] = None
+    duration_ms: Optional[float] = None
+    execution_time: datetime
+
+
+# Analytics Schemas
+class ExitStatusCount(BaseModel):
+    exit_status: Optional[int]  # None when the run never got one (connection error, blocked)
+    count: int
+
+
+class DurationStats(BaseModel):
+    count: int
+    mean_ms: Optional[float]
+    p50_ms: Optional[float]
+    p90_ms: Optional[float]
+    p99_ms: Optional[float]
+    max_ms: Optional[float]
+
+
+class ExecutionStats(BaseModel):
+    executions: int
+    failures: int
+    failure_rate: float
+    cached: int
+    exit_statuses: List[ExitStatusCount]
+    duration: DurationStats
+
+
+class ExecutionStatsBucket(ExecutionStats):
+    bucket_start: datetime
+
+
+class ServerAnalytics(ExecutionStats):
+    server_id: int
+    server_name: Optional[str]
+    buckets: Optional[List[ExecutionStatsBucket]] = None
+
+
+
+# File Transfer Schemas
+class FileTransferResponse(BaseModel):
+    id: int
+    server_id: int
+    direction: str
+    remote_path: str
+    range_start: Optional[int]
+    range_end: Optional[int]
+    bytes_transferred: int
+    duration_ms: Optional[float]
+    status: str
+    error: Optional[str]
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class DirectorySync(BaseModel):
+    source: str = Field(..., min_length=1)  # bundle directory under SYNC_SOURCE_DIR/<user id>
+    destination: str = Field(..., min_length=1, pattern="^/")  # absolute remote directory
+    checksum: bool = False  # compare every file's blocks, not only those whose size or mtime differ
+
+
+class SyncedFileResponse(BaseModel):
+    path: str
+    action: str  # created / updated / failed
+    size: int
+    bytes_sent: int
+    error: Optional[str] = None
+
+
+class DirectorySyncResponse(BaseModel):
+    transfer_id: int
+    files_total: int
+    files_unchanged: int
+    files_created: int
+    files_updated: int
+    files_failed: int
+    bytes_total: int  # size of every local file
+    bytes_sent: int
+    bytes_saved: int  # bytes_total - bytes_sent
+    duration_ms: float
+    files: List[SyncedFileResponse]  # every file that wasn't unchanged
+
+
+# Server Facts Schemas
+class ServerFactsResponse(BaseModel):
+    server_id: int
+    hostname: Optional[str]
+    os_name: Optional[str]
+    os_version: Optional[str]
+    kernel: Optional[str]
+    architecture: Optional[str]
+    cpu_count: Optional[int]
+    cpu_model: Optional[str]
+    memory_total: Optional[int]  # bytes
+    memory_available: Optional[int]
+    disk_total: Optional[int]  # root filesystem, bytes
+    disk_used: Optional[int]
+    disk_available: Optional[int]
+    uptime_seconds: Optional[float]
+    collected_at: Optional[datetime]  # naive UTC; None until a collection has succeeded
+    attempted_at: Optional[datetime]
+    error: Optional[str]  # the last attempt's, if it failed
+    
+    class Config:
+        from_attributes = True
+
+
+class FactsRefreshResponse(BaseModel):
+    refreshed: int
+    failed: int
+
+
+# Schedule Schemas
+class ScheduleCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    command: str = Field(..., min_length=1)
+    cron: str = Field(..., min_length=1, max_length=100)
+    server_ids: List[int] = Field(..., min_length=1)
+    jitter_seconds: int = Field(0, ge=0)
+    enabled: bool = True
+
+
+class ScheduleUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    command: Optional[str] = Field(None, min_length=1)
+    cron: Optional[str] = Field(None, min_length=1, max_length=100)
+    server_ids: Optional[List[int]] = Field(None, min_length=1)
+    jitter_seconds: Optional[int] = Field(None, ge=0)
+    enabled: Optional[bool] = None
+
+
+class ScheduleResponse(BaseModel):
+    id: int
+    user_id: int
+    name: str
+    command: str
+    cron: str
+    server_ids: List[int]
+    jitter_seconds: int
+    enabled: bool
+    next_run_at: Optional[datetime]
+    last_run_at: Optional[datetime]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+# Shell Session Schemas
+class ShellSessionCreate(BaseModel):
+    server_id: int
+    cols: int = Field(80, ge=1, le=1000)
+    rows: int = Field(24, ge=1, le=1000)
+    transcript: bool = False
+
+
+class ShellSessionResponse(BaseModel):
+    id: str
+    server_id: int
+    server_name: str
+    created_at: datetime
+    idle_seconds: float
+    attached: bool
+    transcript: bool
+    websocket_path: str
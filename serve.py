@@ -0,0 +1,87 @@
+"""
+Production entrypoint.
+
+    python serve.py
+
+Runs WORKERS uvicorn worker processes (one per CPU core by default) on
+HOST:PORT with uvloop and httptools when they are installed, no reload, and
+keep-alive held for KEEPALIVE_TIMEOUT seconds. On SIGTERM/SIGINT each worker
+starts draining at once (new SSH work gets 503, /health goes 503, shell
+sessions are closed), lets in-flight requests, scheduled runs and emails
+finish for up to SHUTDOWN_DRAIN_TIMEOUT seconds, then closes its pools.
+"""
+import importlib.util
+import logging
+import os
+import sys
+from types import FrameType
+from typing import Optional
+
+import uvicorn
+from uvicorn.main import STARTUP_FAILURE
+from uvicorn.supervisors import Multiprocess
+
+from config import settings
+
+logger = logging.getLogger("serve")
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server that starts the app's drain when the shutdown signal arrives, not after the HTTP drain"""
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        if not self.should_exit:
+            from drain import drain
+            drain.begin()
+        super().handle_exit(sig, frame)
+
+
+class DrainingSupervisor(Multiprocess):
+    """Signals every worker before waiting on any, so they drain in parallel rather than one after another"""
+
+    def shutdown(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        logger.info(f"Stopping parent process [{self.pid}]")
+
+
+def build_config() -> uvicorn.Config:
+    return uvicorn.Config(
+        "main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.WORKERS or os.cpu_count() or 1,
+        loop="uvloop" if _available("uvloop") else "asyncio",
+        http="httptools" if _available("httptools") else "h11",
+        timeout_keep_alive=settings.KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=int(settings.SHUTDOWN_DRAIN_TIMEOUT),
+        reload=False,
+    )
+
+
+def main() -> int:
+    config = build_config()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger.info(
+        f"Starting {config.workers} worker(s) on {config.host}:{config.port} "
+        f"(loop={config.loop}, http={config.http}, keep-alive={config.timeout_keep_alive}s, "
+        f"drain={settings.SHUTDOWN_DRAIN_TIMEOUT}s)"
+    )
+    server = DrainingServer(config=config)
+    if config.workers > 1:
+        DrainingSupervisor(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+    if not server.started and config.workers == 1:
+        return STARTUP_FAILURE
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
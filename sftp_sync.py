@@ -0,0 +1,311 @@
+"""
+rsync-style directory sync over SFTP.
+
+sync_directory() pushes a directory staged on this host to a remote directory
+and only sends what differs. Each user's bundles are staged in their own
+directory, SYNC_SOURCE_DIR/<user id>/<bundle>, by whatever builds them (a
+deploy job copying into a shared volume, say); a user can only sync from
+their own directory.
+
+1. Every local file is stat()ed on the remote side. Same size and mtime
+   (to the second, as SFTP reports it) means unchanged, as in rsync's quick
+   check.
+2. Changed files are hashed remotely, SYNC_BLOCK_SIZE blocks at a time: one
+   python3 exec per batch of files, so no file content crosses the wire to
+   compare it.
+3. The local blocks whose hash differs (or that lie past the remote end) are
+   written into the remote file at their offset and the file is truncated
+   to the local size. Files that are new, or that couldn't be hashed
+   (no python3 on the host), are sent whole to a temporary name and
+   renamed into place.
+
+Blocks sit at fixed offsets (no rolling checksum), so an edit that shifts
+the rest of a file resends everything after it. Delta updates are written in
+place, like rsync --inplace; whole files replace the old one atomically.
+Synced files get the local mtime, so the next run skips them in step 1.
+
+Files are stat()ed, hashed and sent SYNC_MAX_CONCURRENCY at a time, each
+worker thread on its own SFTP channel of one SSH connection. Remote files
+not present locally are left alone. Blocking; run it in the threadpool.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import shlex
+import stat
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config import settings
+from metrics import SFTP_SYNC_BYTES_SAVED
+from ssh_service import ExecutionTimings, SSHService
+
+logger = logging.getLogger(__name__)
+
+# Prints "<index> <sha1>,<sha1>,..." per path argument, or just "<index>" when it can't be read
+_BLOCK_HASHES_SCRIPT = """
+import hashlib, sys
+size = int(sys.argv[1])
+for index, path in enumerate(sys.argv[2:]):
+    try:
+        f = open(path, "rb")
+    except OSError:
+        print(index)
+        continue
+    hashes = []
+    with f:
+        block = f.read(size)
+        while block:
+            hashes.append(hashlib.sha1(block).hexdigest())
+            block = f.read(size)
+    print(index, ",".join(hashes))
+"""
+
+
+@dataclass
+class SyncedFile:
+    path: str  # relative to the synced directory
+    action: str  # unchanged / created / updated / failed
+    size: int
+    bytes_sent: int = 0
+    error: Optional[str] = None
+    # Remote state found in step 1 and, for changed files, its block hashes
+    remote_size: Optional[int] = field(default=None, repr=False)
+    remote_hashes: Optional[List[str]] = field(default=None, repr=False)
+
+
+@dataclass
+class SyncReport:
+    files: List[SyncedFile]
+    duration_ms: float
+
+    def count(self, action: str) -> int:
+        return sum(1 for synced in self.files if synced.action == action)
+
+    @property
+    def bytes_total(self) -> int:
+        return sum(synced.size for synced in self.files)
+
+    @property
+    def bytes_sent(self) -> int:
+        return sum(synced.bytes_sent for synced in self.files)
+
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes not sent compared with copying every file whole"""
+        return self.bytes_total - self.bytes_sent
+
+
+def resolve_source(user_id: int, source: str) -> str:
+    """
+    Local directory for one of user_id's bundles, source being relative to
+    SYNC_SOURCE_DIR/<user_id>. Raises ValueError for paths that escape the
+    user's directory and FileNotFoundError when the bundle is missing.
+    """
+    root = os.path.realpath(os.path.join(settings.SYNC_SOURCE_DIR, str(user_id)))
+    path = os.path.realpath(os.path.join(root, source))
+    if path == root or os.path.commonpath([root, path]) != root:
+        raise ValueError("Sync source must be a bundle inside your sync directory")
+    if not os.path.isdir(path):
+        raise FileNotFoundError(source)
+    return path
+
+
+def _local_files(source_dir: str) -> Dict[str, os.stat_result]:
+    """Regular files under source_dir by relative POSIX path; symlinks and special files are skipped"""
+    files = {}
+    for directory, _, names in os.walk(source_dir):
+        for name in names:
+            path = os.path.join(directory, name)
+            info = os.lstat(path)
+            if stat.S_ISREG(info.st_mode):
+                files[os.path.relpath(path, source_dir).replace(os.sep, "/")] = info
+    return files
+
+
+def _hash_batches(paths: List[str]) -> List[List[int]]:
+    """Indexes of paths split so each hash command stays under SYNC_HASH_BATCH_BYTES"""
+    batches, batch, length = [], [], 0
+    for index, path in enumerate(paths):
+        if batch and length + len(path) > settings.SYNC_HASH_BATCH_BYTES:
+            batches.append(batch)
+            batch, length = [], 0
+        batch.append(index)
+        length += len(path) + 3
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class _Sync:
+    def __init__(self, ssh_client, source_dir: str, destination: str, checksum: bool):
+        self.ssh_client = ssh_client
+        self.source_dir = source_dir
+        self.destination = destination.rstrip("/") or "/"
+        self.checksum = checksum
+        self.block_size = settings.SYNC_BLOCK_SIZE
+        self._local = threading.local()
+        self._channels = []
+        self._lock = threading.Lock()
+
+    @property
+    def sftp(self):
+        """This worker thread's SFTP channel"""
+        client = getattr(self._local, "sftp", None)
+        if client is None:
+            client = self._local.sftp = self.ssh_client.open_sftp()
+            with self._lock:
+                self._channels.append(client)
+        return client
+
+    def close(self) -> None:
+        for client in self._channels:
+            client.close()
+
+    def remote_path(self, path: str) -> str:
+        return posixpath.join(self.destination, path)
+
+    def compare(self, synced: SyncedFile, local: os.stat_result) -> None:
+        """Step 1: mark synced unchanged, or note what's on the remote side"""
+        try:
+            remote = self.sftp.stat(self.remote_path(synced.path))
+        except FileNotFoundError:
+            synced.action = "created"
+            return
+        except Exception as e:
+            synced.action, synced.error = "failed", str(e)
+            return
+        synced.remote_size = remote.st_size
+        if not self.checksum and remote.st_size == local.st_size and remote.st_mtime == int(local.st_mtime):
+            synced.action = "unchanged"
+
+    def hash_remote(self, batch: List[SyncedFile]) -> None:
+        """Step 2: block hashes for a batch of files, left unset for files the host couldn't hash"""
+        command = " ".join(
+            ["python3", "-c", shlex.quote(_BLOCK_HASHES_SCRIPT), str(self.block_size)]
+            + [shlex.quote(self.remote_path(synced.path)) for synced in batch]
+        )
+        try:
+            output, error, exit_status = SSHService._run(
+                self.ssh_client, command, ExecutionTimings(), timeout=settings.SYNC_HASH_TIMEOUT
+            )
+        except Exception as e:
+            output, error, exit_status = "", str(e), None
+        if exit_status != 0:
+            logger.warning(f"Remote block hashing failed ({exit_status}), sending {len(batch)} file(s) whole: {error[:200]}")
+            return
+        for line in output.splitlines():
+            index, _, hashes = line.partition(" ")
+            if index.isdigit() and int(index) < len(batch):
+                batch[int(index)].remote_hashes = hashes.split(",") if hashes else []
+
+    def send(self, synced: SyncedFile, local: os.stat_result) -> None:
+        """Step 3: make the remote file match the local one"""
+        try:
+            if synced.remote_hashes is not None:
+                self._patch(synced)
+            else:
+                self._replace(synced, local)
+            self.sftp.utime(self.remote_path(synced.path), (local.st_atime, local.st_mtime))
+        except Exception as e:
+            logger.error(f"Sync of {synced.path} to {self.destination} failed: {e}")
+            synced.action, synced.error = "failed", str(e)
+
+    def _patch(self, synced: SyncedFile) -> None:
+        remote_hashes = synced.remote_hashes
+        with open(os.path.join(self.source_dir, synced.path), "rb") as local_file, \
+                self.sftp.open(self.remote_path(synced.path), "r+b", settings.SFTP_CHUNK_SIZE) as remote_file:
+            remote_file.set_pipelined(True)
+            index = 0
+            block = local_file.read(self.block_size)
+            while block:
+                if index >= len(remote_hashes) or hashlib.sha1(block).hexdigest() != remote_hashes[index]:
+                    remote_file.seek(index * self.block_size)
+                    remote_file.write(block)
+                    synced.bytes_sent += len(block)
+                index += 1
+                block = local_file.read(self.block_size)
+            if synced.remote_size != synced.size:
+                remote_file.truncate(synced.size)
+        if not synced.bytes_sent and synced.remote_size == synced.size:
+            synced.action = "unchanged"  # only the mtime differed
+
+    def _replace(self, synced: SyncedFile, local: os.stat_result) -> None:
+        target = self.remote_path(synced.path)
+        directory, name = posixpath.split(target)
+        temporary = posixpath.join(directory, f".{name}.sync-{uuid.uuid4().hex[:8]}")
+        try:
+            with open(os.path.join(self.source_dir, synced.path), "rb") as local_file, \
+                    self.sftp.open(temporary, "wb", settings.SFTP_CHUNK_SIZE) as remote_file:
+                remote_file.set_pipelined(True)
+                block = local_file.read(settings.SFTP_CHUNK_SIZE)
+                while block:
+                    remote_file.write(block)
+                    synced.bytes_sent += len(block)
+                    block = local_file.read(settings.SFTP_CHUNK_SIZE)
+            self.sftp.chmod(temporary, stat.S_IMODE(local.st_mode))
+            self.sftp.posix_rename(temporary, target)
+        except Exception:
+            try:
+                self.sftp.remove(temporary)
+            except IOError:
+                pass
+            raise
+
+    def make_directories(self, paths: List[str]) -> None:
+        """Create the remote directories new files go into, parents first"""
+        needed = set()
+        for path in paths:
+            directory = posixpath.dirname(self.remote_path(path))
+            while directory not in needed and directory not in ("/", ""):
+                needed.add(directory)
+                directory = posixpath.dirname(directory)
+        for directory in sorted(needed, key=lambda name: name.count("/")):
+            try:
+                self.sftp.stat(directory)
+            except FileNotFoundError:
+                self.sftp.mkdir(directory)
+
+
+def sync_directory(server, source_dir: str, destination: str, checksum: bool = False) -> SyncReport:
+    """
+    Make destination on server match source_dir's files. With checksum every
+    file is compared block by block, not just those whose size or mtime differ.
+    Connection and authentication errors are raised; per-file errors are
+    reported on the file.
+    """
+    started = time.perf_counter()
+    local_files = _local_files(source_dir)
+    files = [SyncedFile(path, "updated", info.st_size) for path, info in sorted(local_files.items())]
+    ssh_client = SSHService.connect_to_server(server)
+    sync = _Sync(ssh_client, source_dir, destination, checksum)
+    try:
+        with ThreadPoolExecutor(settings.SYNC_MAX_CONCURRENCY, thread_name_prefix="sftp-sync") as pool:
+            list(pool.map(lambda synced: sync.compare(synced, local_files[synced.path]), files))
+            sync.make_directories([synced.path for synced in files if synced.action == "created"])
+            changed = [synced for synced in files if synced.action == "updated"]
+            list(pool.map(
+                lambda batch: sync.hash_remote([changed[index] for index in batch]),
+                _hash_batches([sync.remote_path(synced.path) for synced in changed])
+            ))
+            list(pool.map(
+                lambda synced: sync.send(synced, local_files[synced.path]),
+                [synced for synced in files if synced.action in ("created", "updated")]
+            ))
+    finally:
+        sync.close()
+        ssh_client.close()
+
+    report = SyncReport(files, round((time.perf_counter() - started) * 1000, 3))
+    SFTP_SYNC_BYTES_SAVED.inc(amount=report.bytes_saved)
+    logger.info(
+        f"Synced {len(files)} file(s) to {server.host}:{destination}: {report.count('created')} created, "
+        f"{report.count('updated')} updated, {report.count('failed')} failed, "
+        f"{report.bytes_sent} of {report.bytes_total} bytes sent"
+    )
+    return report
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import secrets
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from config import settings
+from database import SessionLocal
+from metrics import Gauge, SHELL_BYTES
+from models import CommandLog, Server
+import output_blobs
+from ssh_service import SSHService
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_COMMAND = "[interactive shell]"
+
+
+class ShellSession:
+    """
+    One PTY shell channel kept open between WebSocket attachments.
+
+    A reader thread moves channel output into a bounded asyncio queue. When
+    nobody drains it (slow or detached client) the thread blocks, the SSH
+    receive window fills and the remote program stalls instead of output
+    piling up in memory.
+    """
+
+    def __init__(self, user_id: int, server: Server, client, channel, loop, transcript: bool):
+        self.id = secrets.token_urlsafe(16)
+        self.user_id = user_id
+        self.server_id = server.id
+        self.server_name = server.name
+        self.client = client
+        self.channel = channel
+        self.loop = loop
+        self.output: asyncio.Queue = asyncio.Queue(maxsize=settings.SHELL_OUTPUT_QUEUE_SIZE)
+        self.created_at = datetime.utcnow()
+        self.last_activity = time.monotonic()
+        self.attached = False
+        self.exit_status: Optional[int] = None
+        self.finished = threading.Event()
+        self.closed = False
+        self.transcript: Optional[bytearray] = bytearray() if transcript else None
+        self._reader = threading.Thread(target=self._read_loop, name=f"shell-{self.id[:8]}", daemon=True)
+
+    def start(self) -> None:
+        self._reader.start()
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_activity
+
+    def _put(self, item) -> bool:
+        future = asyncio.run_coroutine_threadsafe(self.output.put(item), self.loop)
+        while True:
+            try:
+                future.result(timeout=1)
+                return True
+            except FutureTimeoutError:
+                if self.closed:
+                    future.cancel()
+                    return False
+
+    def _read_loop(self) -> None:
+        try:
+            while not self.closed:
+                data = self.channel.recv(settings.SHELL_READ_SIZE)
+                if not data:
+                    break
+                self.touch()
+                SHELL_BYTES.inc("output", amount=len(data))
+                if self.transcript is not None and len(self.transcript) < settings.SHELL_TRANSCRIPT_MAX_BYTES:
+                    self.transcript.extend(data[:settings.SHELL_TRANSCRIPT_MAX_BYTES - len(self.transcript)])
+                if not self._put(data):
+                    return
+            if self.channel.exit_status_ready():
+                self.exit_status = self.channel.recv_exit_status()
+        except Exception as e:
+            logger.debug(f"Shell session {self.id} reader stopped: {e}")
+        finally:
+            self.finished.set()
+            if not self.closed:
+                # End-of-stream marker for whoever is (or next gets) attached
+                self._put(None)
+
+    async def send(self, data: bytes) -> None:
+        self.touch()
+        SHELL_BYTES.inc("input", amount=len(data))
+        # sendall blocks while the remote window is full; keep that off the event loop
+        await run_in_threadpool(self.channel.sendall, data)
+
+    async def resize(self, cols: int, rows: int) -> None:
+        await run_in_threadpool(self.channel.resize_pty, cols, rows)
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            self.channel.close()
+        finally:
+            self.client.close()
+
+
+class ShellSessionManager:
+    """
+    Per-process registry of open shell sessions.
+
+    Sessions live in the worker that opened them, so with several workers a
+    client must reach the same one (sticky routing) to reattach.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, ShellSession] = {}
+        # user_id -> sessions still connecting, counted against the per-user limit
+        self._opening: Dict[int, int] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        for session_id in list(self._sessions):
+            await self.close(session_id, "shutdown")
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def list_for_user(self, user_id: int) -> List[ShellSession]:
+        return [session for session in self._sessions.values() if session.user_id == user_id]
+
+    def get(self, session_id: str, user_id: int) -> Optional[ShellSession]:
+        session = self._sessions.get(session_id)
+        if session is None or session.user_id != user_id:
+            return None
+        return session
+
+    async def open(self, user_id: int, server: Server, cols: int, rows: int, transcript: bool) -> ShellSession:
+        if len(self.list_for_user(user_id)) + self._opening.get(user_id, 0) >= settings.SHELL_MAX_SESSIONS_PER_USER:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"At most {settings.SHELL_MAX_SESSIONS_PER_USER} shell sessions per user"
+            )
+
+        def connect():
+            client = SSHService.connect_to_server(server)
+            try:
+                client.get_transport().set_keepalive(settings.SHELL_KEEPALIVE_INTERVAL)
+                channel = client.invoke_shell(term=settings.SHELL_TERM, width=cols, height=rows)
+                return client, channel
+            except Exception:
+                client.close()
+                raise
+
+        self._opening[user_id] = self._opening.get(user_id, 0) + 1
+        try:
+            client, channel = await run_in_threadpool(connect)
+            session = ShellSession(user_id, server, client, channel, asyncio.get_running_loop(), transcript)
+            self._sessions[session.id] = session
+        finally:
+            self._opening[user_id] -= 1
+            if not self._opening[user_id]:
+                del self._opening[user_id]
+        session.start()
+        logger.info(f"Opened shell session {session.id} on {server.host} for user {user_id}")
+        return session
+
+    async def close(self, session_id: str, reason: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        await run_in_threadpool(session.close)
+        # Wake an attached socket even if the queue is full of unread output
+        while True:
+            try:
+                session.output.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                session.output.get_nowait()
+        logger.info(f"Closed shell session {session_id} ({reason})")
+        if session.transcript is not None:
+            await run_in_threadpool(_save_transcript, session)
+
+    async def _reap_loop(self) -> None:
+        interval = max(min(settings.SHELL_IDLE_TIMEOUT / 4, 30), 1)
+        while True:
+            await asyncio.sleep(interval)
+            for session in list(self._sessions.values()):
+                if session.idle_seconds > settings.SHELL_IDLE_TIMEOUT:
+                    await self.close(session.id, "idle timeout")
+                elif session.finished.is_set() and not session.attached:
+                    await self.close(session.id, "shell exited")
+
+
+def _save_transcript(session: ShellSession) -> None:
+    truncated = len(session.transcript) >= settings.SHELL_TRANSCRIPT_MAX_BYTES
+    db = SessionLocal()
+    try:
+        db.add(CommandLog(
+            user_id=session.user_id,
+            server_id=session.server_id,
+            command=TRANSCRIPT_COMMAND,
+            exit_status=session.exit_status,
+            **output_blobs.store(
+                db, session.transcript.decode("utf-8", errors="replace"), "Transcript truncated" if truncated else None
+            )
+        ))
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to save transcript for shell session {session.id}: {e}")
+    finally:
+        db.close()
+
+
+shell_sessions = ShellSessionManager()
+
+Gauge("shell_sessions_open", "Open interactive shell sessions", callback=lambda: [((), shell_sessions.count())])